@@ -0,0 +1,222 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: benchmark suite.
+  Times MowersTestPlayer.open, apply, apply(with_history=True) and MowersViz frame rendering on synthetic scenarios
+  (see scenariogen), saves the results as json and flags regressions against a saved baseline.
+  The import time of the headless modules (and of the visualization stack) is measured in fresh interpreters and
+  checked against a start-up budget.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from mowerstestplayer import MowersTestPlayer
+from scenariogen import generate_scenario
+
+# benchmarked scenario sizes
+DEFAULT_SIZES = [
+    {'name': 'small', 'grid': [10, 10], 'mowers': 100, 'length': 100, 'turn_ratio': 0.3},
+    {'name': 'medium', 'grid': [100, 100], 'mowers': 1000, 'length': 1000, 'turn_ratio': 0.3},
+    # no MowersViz benchmark on this grid (one tick by cell)
+    {'name': 'long-runs', 'grid': [1000, 1000], 'mowers': 100, 'length': 10000, 'turn_ratio': 0.01, 'viz': False},
+]
+QUICK_SIZES = DEFAULT_SIZES[:1]
+
+RENDERED_FRAMES = 20  # number of frames rendered by the MowersViz benchmark
+
+DEFAULT_TOLERANCE = 0.25  # a timing greater than (1 + tolerance) * baseline timing is a regression
+
+# modules imported by the headless commands (see mowers.py), they must not load the visualization stack
+HEADLESS_MODULES = ['mowers', 'runner', 'mowerstestplayer']
+VIZ_MODULES = ['mowersviz']
+VIZ_STACK = ['numpy', 'matplotlib']
+
+DEFAULT_IMPORT_BUDGET = 0.15  # greatest import time of the headless modules in seconds
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(' '.join(sorted(name for name in {stack} if name in sys.modules)))
+"""
+
+
+def best_time(function, repeat):
+    """
+    :param function: function to time (without parameters)
+    :param repeat: number of runs
+    :return: the best wall time of the runs in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_scenario(scenario_file, repeat=3, with_viz=True):
+    """
+    Time the player (and the visualizer) on a test file.
+    :param scenario_file: path of test file
+    :param repeat: number of runs of each timing (the best one is kept)
+    :param with_viz: if True, time the rendering of RENDERED_FRAMES frames with MowersViz
+    :return: a dictionary phase ==> seconds
+    """
+    player = MowersTestPlayer(scenario_file)
+    timings = {'open': best_time(player.open, repeat)}
+
+    def apply(with_history):
+        player.open()
+        start = time.perf_counter()
+        player.apply(with_history=with_history)
+        return time.perf_counter() - start
+    timings['apply'] = min(apply(False) for _ in range(repeat))
+    timings['apply_with_history'] = min(apply(True) for _ in range(repeat))
+    if with_viz:
+        import matplotlib
+        matplotlib.use('Agg')
+        from mowersviz import MowersViz
+        viz = MowersViz(scenario_file, max_frames=RENDERED_FRAMES)
+        timings['render_frame'] = best_time(lambda: viz.render_frames(0, viz.frames_count()), repeat) \
+            / viz.frames_count()
+    return timings
+
+
+def import_time(modules, repeat=3):
+    """
+    Time the import of modules in fresh interpreters (started from the directory of this file).
+    :param modules: list of module names
+    :param repeat: number of runs (the best one is kept)
+    :return: a tuple (best import time in seconds, list of the VIZ_STACK packages loaded by the import)
+    """
+    script = IMPORT_SCRIPT.format(modules=', '.join(modules), stack=VIZ_STACK)
+    best, loaded = None, []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True).stdout
+        lines = output.split('\n')
+        elapsed = float(lines[0])
+        best = elapsed if best is None else min(best, elapsed)
+        loaded = lines[1].split()
+    return best, loaded
+
+
+def benchmark_startup(repeat=3, with_viz=True):
+    """
+    Time the import of the headless modules (and of the visualization modules).
+    :param repeat: number of runs of each timing
+    :param with_viz: if True, also time the import of the visualization modules
+    :return: a tuple (dictionary phase ==> seconds, list of the VIZ_STACK packages loaded by the headless modules)
+    """
+    timings = {}
+    timings['headless_import'], loaded = import_time(HEADLESS_MODULES, repeat)
+    if with_viz:
+        timings['viz_import'] = import_time(VIZ_MODULES, repeat)[0]
+    return timings, loaded
+
+
+def check_startup(startup, budget=DEFAULT_IMPORT_BUDGET):
+    """
+    :param startup: start-up benchmark results (see run_benchmarks)
+    :param budget: greatest import time of the headless modules in seconds
+    :return: the list of start-up budget violations as strings
+    """
+    violations = []
+    if startup['headless_loads']:
+        violations.append('headless modules load {}'.format(', '.join(startup['headless_loads'])))
+    if startup['timings']['headless_import'] > budget:
+        violations.append('headless import: {:.6f}s (budget {:.6f}s)'.format(startup['timings']['headless_import'],
+                                                                            budget))
+    return violations
+
+
+def run_benchmarks(sizes=None, repeat=3, with_viz=True, with_startup=True):
+    """
+    Run the benchmarks on generated scenarios.
+    :param sizes: list of scenario sizes (see DEFAULT_SIZES)
+    :param repeat: number of runs of each timing
+    :param with_viz: if True, time MowersViz frame rendering
+    :param with_startup: if True, time the import of the modules (see benchmark_startup)
+    :return: the results as a dictionary (json serializable)
+    """
+    bench_results = {'python': platform.python_version(), 'machine': platform.machine()}
+    if with_startup:
+        timings, loaded = benchmark_startup(repeat, with_viz)
+        bench_results['startup'] = {'timings': timings, 'headless_loads': loaded}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in DEFAULT_SIZES if sizes is None else sizes:
+            scenario_file = os.path.join(tmp_dir, size['name'] + '.data')
+            steps = generate_scenario(scenario_file, tuple(size['grid']), size['mowers'], size['length'],
+                                      size['turn_ratio'], seed=0)
+            timings = benchmark_scenario(scenario_file, repeat, with_viz and size.get('viz', True))
+            results.append({'size': size, 'steps': steps, 'timings': timings})
+    bench_results['results'] = results
+    return bench_results
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare benchmark results with a baseline (results are matched by scenario size name and phase).
+    :param results: benchmark results (see run_benchmarks)
+    :param baseline: baseline benchmark results
+    :param tolerance: accepted slowdown ratio
+    :return: the list of regressions as strings
+    """
+    baseline_timings = {result['size']['name']: result['timings'] for result in baseline['results']}
+    if 'startup' in baseline:
+        baseline_timings['startup'] = baseline['startup']['timings']
+    named_timings = [(result['size']['name'], result['timings']) for result in results['results']]
+    if 'startup' in results:
+        named_timings.append(('startup', results['startup']['timings']))
+    regressions = []
+    for name, timings in named_timings:
+        for phase, seconds in timings.items():
+            reference = baseline_timings.get(name, {}).get(phase)
+            if reference and seconds > reference * (1.0 + tolerance):
+                regressions.append('{} {}: {:.6f}s (baseline {:.6f}s, +{:.0%})'
+                                   .format(name, phase, seconds, reference, seconds / reference - 1.0))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the mowers benchmark suite.')
+    parser.add_argument('--output', default='benchmark.json', help='json file where results are saved')
+    parser.add_argument('--baseline', default=None, help='json file of baseline results to compare with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='accepted slowdown ratio')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs of each timing')
+    parser.add_argument('--quick', action='store_true', help='only benchmark the smallest scenario')
+    parser.add_argument('--no-viz', action='store_true', help='do not benchmark MowersViz')
+    parser.add_argument('--import-budget', type=float, default=DEFAULT_IMPORT_BUDGET,
+                        help='greatest import time of the headless modules in seconds')
+    parser.add_argument('--startup-only', action='store_true', help='only benchmark the import time')
+    args = parser.parse_args()
+    bench_results = run_benchmarks([] if args.startup_only else QUICK_SIZES if args.quick else DEFAULT_SIZES,
+                                   args.repeat, not args.no_viz)
+    with open(args.output, 'w') as output:
+        json.dump(bench_results, output, indent=2)
+    for bench_result in bench_results['results']:
+        print('{:10} {}'.format(bench_result['size']['name'],
+                                ' '.join('{}={:.6f}s'.format(phase, seconds)
+                                         for phase, seconds in bench_result['timings'].items())))
+    print('{:10} {}'.format('startup', ' '.join('{}={:.6f}s'.format(phase, seconds)
+                                                 for phase, seconds in bench_results['startup']['timings'].items())))
+    found = ['BUDGET ' + violation for violation in check_startup(bench_results['startup'], args.import_budget)]
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found.extend('REGRESSION ' + regression
+                         for regression in find_regressions(bench_results, json.load(baseline_file), args.tolerance))
+    for failure in found:
+        print(failure)
+    sys.exit(1 if found else 0)
@@ -0,0 +1,221 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: compact binary test scenario format.
+  Layout (little-endian):
+  - header (32 bytes): magic b'MOWB', version (uint16), reserved (uint16), grid upper right corner x and y (uint32),
+    number of mowers (uint64), offset of the status table (uint64)
+  - programs: each program is packed at 2 bits by moving code (4 moving codes by byte, first code in the lowest bits,
+    codes of fleet.ACTION_CODES) and starts on a byte boundary
+  - status table (32 bytes by mower): x, y (uint32), orientation index (uint8), padding, offset of the program from
+    the start of the programs (uint64, in bytes) and program length (uint64, in moving codes)
+  The loader memory-maps the file: the status table is used in place and programs are unpacked straight into the
+  action codes arrays of the vectorized engine (see fleet.MowersFleet).
+"""
+
+import mmap
+import struct
+
+import numpy as np
+
+from fleet import ENCODING_CHUNK_BYTES, NO_ACTION, MowersFleet, encode_programs
+from mower import Mower, expand_program
+from mowerstestplayer import iter_mower_programs, read_grid_up_right_corner, read_line
+
+MAGIC = b'MOWB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIQQ')
+
+STATUS_DTYPE = np.dtype([('x', '<u4'), ('y', '<u4'), ('heading', 'u1'), ('padding', 'V7'),
+                         ('offset', '<u8'), ('length', '<u8')])
+
+# action code ==> moving code (used to convert back to the text format)
+MOVING_CODES_LUT = np.frombuffer(b'AGD?', dtype=np.uint8)
+
+BIT_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+
+def pack_program(moving_program):
+    """
+    Pack a program at 2 bits by moving code.
+    :param moving_program: a string of valid moving codes
+    :return: the packed program as bytes
+    """
+    codes = encode_programs([moving_program])[:, 0]
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes
+    return np.bitwise_or.reduce(padded.reshape(-1, 4) << BIT_SHIFTS, axis=1).astype(np.uint8).tobytes()
+
+
+def unpack_codes(packed, length):
+    """
+    Unpack a program packed at 2 bits by moving code.
+    :param packed: numpy array of bytes
+    :param length: number of moving codes of the program
+    :return: a numpy array of action codes
+    """
+    return ((packed[:, None] >> BIT_SHIFTS) & 3).reshape(-1)[:length]
+
+
+def text_to_binary(text_file, binary_file):
+    """
+    Convert a test file from the text format to the binary format (the text file is read in streaming mode).
+    :param text_file: path of the test file (text format)
+    :param binary_file: path of the file to write (binary format)
+    :return: the number of mowers written
+    """
+    statuses = bytearray()
+    with open(text_file, 'r') as f, open(binary_file, 'wb') as out:
+        up_right = read_grid_up_right_corner(read_line(f), 1)
+        out.write(HEADER.pack(MAGIC, VERSION, 0, up_right[0], up_right[1], 0, 0))
+        offset = 0
+        count = 0
+        status_record = np.zeros(1, dtype=STATUS_DTYPE)
+        for status, program in iter_mower_programs(f, up_right):
+            program = expand_program(program)
+            packed = pack_program(program)
+            out.write(packed)
+            status_record[0] = (status[0][0], status[0][1], Mower.ORIENTATION_INDEXES[status[1]], b'', offset,
+                                len(program))
+            statuses += status_record.tobytes()
+            offset += len(packed)
+            count += 1
+        out.write(statuses)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, 0, up_right[0], up_right[1], count, HEADER.size + offset))
+    return count
+
+
+class BinaryScenario(object):
+    """
+    Memory-mapped test scenario in the binary format.
+    """
+
+    def __init__(self, file_name):
+        """
+        Constructor. Map the file and read its header.
+        :param file_name: path of the binary test file
+        """
+        self._file = open(file_name, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise Exception('{} is not a binary test file'.format(file_name))
+        magic, version, _, up_right_x, up_right_y, count, table_offset = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise Exception('{} is not a binary test file (version {})'.format(file_name, VERSION))
+        self._up_right = (up_right_x, up_right_y)
+        # status table used in place (no copy)
+        self._statuses = np.frombuffer(self._mm, dtype=STATUS_DTYPE, count=count, offset=table_offset)
+        self._programs = np.frombuffer(self._mm, dtype=np.uint8, count=table_offset - HEADER.size,
+                                       offset=HEADER.size)
+        if count and int(self._statuses['heading'].max()) >= len(Mower.ORIENTATIONS):
+            self.close()
+            raise Exception('{}: invalid orientation in the status table'.format(file_name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Unmap and close the file (numpy views on the file should not be used anymore).
+        :return: None
+        """
+        self._statuses, self._programs = None, None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    @property
+    def up_right_corner(self):
+        return self._up_right
+
+    @property
+    def statuses(self):
+        """
+        :return: the status table (numpy structured array using the mapped file)
+        """
+        return self._statuses
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def program_codes(self, idx, start=0, stop=None):
+        """
+        :param idx: mower index
+        :param start: first step to unpack
+        :param stop: step after the last step to unpack (default: end of the program)
+        :return: the steps [start, stop[ of the program of the mower as a numpy array of action codes
+        """
+        offset, length = int(self._statuses['offset'][idx]), int(self._statuses['length'][idx])
+        stop = length if stop is None else min(stop, length)
+        if start >= stop:
+            return np.zeros(0, dtype=np.uint8)
+        # only the bytes holding the steps are unpacked
+        first_byte = start // 4
+        packed = self._programs[offset + first_byte:offset + (stop + 3) // 4]
+        return unpack_codes(packed, stop - first_byte * 4)[start - first_byte * 4:]
+
+    def program(self, idx):
+        """
+        :param idx: mower index
+        :return: the program of the mower as a string
+        """
+        return MOVING_CODES_LUT[self.program_codes(idx)].tobytes().decode('ascii')
+
+    def status(self, idx):
+        """
+        :param idx: mower index
+        :return: the initial status of the mower as a tuple (position, orientation)
+        """
+        record = self._statuses[idx]
+        return (int(record['x']), int(record['y'])), Mower.ORIENTATIONS[record['heading']]
+
+    def apply(self, chunk_size=1 << 16, chunk_bytes=ENCODING_CHUNK_BYTES):
+        """
+        Apply the scenario with the vectorized engine, chunk by chunk of mowers. Programs are unpacked straight into
+        the action codes arrays of the engine by windows of steps fitting in chunk_bytes, and the mowers whose program
+        is over are dropped from the next windows (as in MowersFleet.run).
+        :param chunk_size: number of mowers moved together
+        :param chunk_bytes: memory budget of the action codes unpacked at once
+        :return: the list of final status of the mowers as strings
+        """
+        all_status = []
+        for start in range(0, len(self), chunk_size):
+            chunk = self._statuses[start:start + chunk_size]
+            fleet = MowersFleet.from_arrays(self._up_right, chunk['x'], chunk['y'], chunk['heading'])
+            lengths = chunk['length'].astype(np.int64)
+            step = 0
+            active = np.flatnonzero(lengths > step)
+            while len(active):
+                window = max(1, chunk_bytes // len(active))
+                codes = np.full((min(window, int(lengths[active].max()) - step), len(active)), NO_ACTION,
+                                dtype=np.uint8)
+                for column, idx in enumerate(active):
+                    program_codes = self.program_codes(start + idx, step, step + window)
+                    codes[:len(program_codes), column] = program_codes
+                fleet.run_codes(codes, active)
+                step += window
+                active = active[lengths[active] > step]
+            all_status.extend(fleet.get_str_status())
+        return all_status
+
+
+def binary_to_text(binary_file, text_file):
+    """
+    Convert a test file from the binary format to the text format.
+    :param binary_file: path of the binary test file
+    :param text_file: path of the file to write (text format)
+    :return: the number of mowers written
+    """
+    with BinaryScenario(binary_file) as scenario, open(text_file, 'w') as out:
+        out.write('{} {}\n'.format(scenario.up_right_corner[0], scenario.up_right_corner[1]))
+        for idx in range(len(scenario)):
+            position, orientation = scenario.status(idx)
+            out.write('{} {} {}\n{}\n'.format(position[0], position[1], orientation, scenario.program(idx)))
+        return len(scenario)
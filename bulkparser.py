@@ -0,0 +1,176 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: fast ingestion of (large) test files.
+  The test file is memory-mapped and split into shards at (mower status, program) couples of lines boundaries. Each
+  shard is parsed (programs are validated over the raw bytes) and applied in a process pool. Final status are returned
+  in the file order and errors are reported with the same line numbers as MowersTestPlayer.open.
+"""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lawn import Lawn
+from mower import Mower
+from mowerstestplayer import read_grid_up_right_corner, read_mower_status, read_program
+
+VALID_MOVING_CODES = ''.join(Mower.MOVING_CODES).encode('ascii')
+VALID_ORIENTATIONS = [o.encode('ascii') for o in Mower.ORIENTATIONS]
+
+DEFAULT_SHARD_SIZE = 1 << 25  # shards of about 32MB (each shard is loaded in memory by its worker)
+
+COUNT_CHUNK_SIZE = 1 << 24  # size of the chunks used to count lines in the memory-mapped file
+
+
+def count_lines(mm, start, end):
+    """
+    Count the end of line characters of a memory-mapped file between two offsets (chunk by chunk).
+    :param mm: memory-mapped file
+    :param start: start offset
+    :param end: end offset
+    :return: the number of '\\n' characters in mm[start:end]
+    """
+    count = 0
+    while start < end:
+        chunk_end = min(start + COUNT_CHUNK_SIZE, end)
+        count += mm[start:chunk_end].count(b'\n')
+        start = chunk_end
+    return count
+
+
+def read_header(mm):
+    """
+    Parse the first line of a memory-mapped test file and find where the mowers part of the file ends (as
+    MowersTestPlayer.open, parsing stops at the first empty line).
+    :param mm: memory-mapped test file
+    :return: a tuple (grid upper right corner, offset of line 2, offset of the end of the mowers part)
+    """
+    header_end = mm.find(b'\n')
+    header_end = len(mm) if header_end < 0 else header_end + 1
+    up_right = read_grid_up_right_corner(mm[:header_end].rstrip(b'\r\n').decode('ascii', 'replace'), 1)
+    end = len(mm)
+    for empty_line in [b'\n\n', b'\n\r\n']:
+        found = mm.find(empty_line, header_end - 1)
+        if 0 <= found < end:
+            end = found + 1
+    return up_right, min(header_end, end), end
+
+
+def find_shards(mm, start, end, shard_size):
+    """
+    Split the mowers part of a memory-mapped test file into shards. Each shard starts with a mower status line.
+    :param mm: memory-mapped test file
+    :param start: offset of line 2
+    :param end: offset of the end of the mowers part
+    :param shard_size: expected size of the shards (in bytes)
+    :return: a list of tuples (shard start offset, shard end offset, line number of the first line of the shard)
+    """
+    shards = []
+    line_number = 2
+    while end - start > shard_size:
+        cut = mm.find(b'\n', start + shard_size, end)
+        if cut < 0:
+            break
+        cut += 1
+        cut_line_number = line_number + count_lines(mm, start, cut)
+        if cut_line_number % 2 == 1:
+            # this is a program line: the shard should end after it
+            cut = mm.find(b'\n', cut, end)
+            if cut < 0:
+                break
+            cut += 1
+            cut_line_number += 1
+        if cut >= end:
+            break
+        shards.append((start, cut, line_number))
+        start, line_number = cut, cut_line_number
+    shards.append((start, end, line_number))
+    return shards
+
+
+def parse_status(line, line_number, up_right):
+    """
+    Parse a raw "mower status" line. Lines which are not formatted as expected by the fast path are parsed by
+    read_mower_status (which reports errors).
+    :param line: the line as bytes (without end of line characters)
+    :param line_number: line number in the input file
+    :param up_right: (int, int) tuple ==> grid lawn upper right corner coordinates
+    :return: a tuple as ((int, int), [NESW]) giving a mower status
+    """
+    fields = line.split(b' ')
+    if len(fields) == 3 and fields[0].isdigit() and fields[1].isdigit() and fields[2] in VALID_ORIENTATIONS:
+        x, y = int(fields[0]), int(fields[1])
+        if x <= up_right[0] and y <= up_right[1]:
+            return (x, y), fields[2].decode('ascii')
+    return read_mower_status(line.decode('ascii', 'replace'), line_number, up_right)
+
+
+def parse_program(line, line_number):
+    """
+    Validate a raw program line (all the characters are checked at once).
+    :param line: the line as bytes (without end of line characters)
+    :param line_number: line number in the input file
+    :return: the program as a string
+    """
+    if line.translate(None, VALID_MOVING_CODES):
+        # let read_program report the error
+        read_program(line.decode('ascii', 'replace'), line_number)
+    return line.decode('ascii')
+
+
+def apply_shard(file_name, start, end, line_number, up_right):
+    """
+    Parse and apply a shard of a test file (executed by the workers of the process pool).
+    :param file_name: test file name
+    :param start: shard start offset
+    :param end: shard end offset
+    :param line_number: line number of the first line of the shard
+    :param up_right: (int, int) tuple ==> grid lawn upper right corner coordinates
+    :return: the list of final status of the mowers of the shard as strings
+    """
+    lawn = Lawn(up_right)
+    with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = mm[start:end].split(b'\n')
+    if lines[-1] == b'':
+        lines.pop()
+    all_status = []
+    status = None
+    for line in lines:
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        if line_number % 2 == 0:
+            status = parse_status(line, line_number, up_right)
+        else:
+            mower = Mower(status[0], status[1], lawn)
+            mower.move_multiple_steps(parse_program(line, line_number))
+            all_status.append(mower.get_str_status())
+        line_number += 1
+    return all_status
+
+
+def apply_bulk(file_name, processes=None, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Parse and apply a test file shard by shard in a process pool.
+    :param file_name: test file name
+    :param processes: number of worker processes (None ==> number of CPUs, 0 ==> shards are applied in the current
+                      process)
+    :param shard_size: expected size of the shards (in bytes)
+    :return: the list of final status of the mowers as strings (file order)
+    """
+    if os.path.getsize(file_name) == 0:
+        read_grid_up_right_corner('', 1)
+    with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        up_right, start, end = read_header(mm)
+        shards = find_shards(mm, start, end, shard_size)
+    all_status = []
+    if processes == 0:
+        for shard in shards:
+            all_status.extend(apply_shard(file_name, shard[0], shard[1], shard[2], up_right))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(apply_shard, file_name, shard[0], shard[1], shard[2], up_right)
+                       for shard in shards]
+            for future in futures:
+                all_status.extend(future.result())
+    return all_status
@@ -0,0 +1,187 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: checkpointed history of the steps executed by a mower.
+  Instead of recording every step, the status of the mower is stored every `interval` steps. Any step is rebuilt by
+  replaying the program from the nearest checkpoint, and when the program is edited from some offset, the simulation
+  resumes from the last checkpoint which is still valid.
+"""
+
+from array import array
+
+from lawn import Lawn
+from mower import Mower, expand_program, program_length
+from statemachine import INVALID_MOVING_CODES_PATTERN, transition_table_for
+
+DEFAULT_CHECKPOINT_INTERVAL = 256
+
+
+class CheckpointedHistory(object):
+    """
+    History of the steps executed by a mower, rebuilt on demand from checkpoints. Indexed access gives the same items
+    as MowerHistory: ((position, orientation), action).
+    """
+
+    def __init__(self, up_right_corner, initial_status, moving_program, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Constructor. Apply the program and store the checkpoints.
+        :param up_right_corner: upper right corner of the lawn grid
+        :param initial_status: initial status of the mower (tuple (position, orientation))
+        :param moving_program: program applied to the mower (string of valid moving codes)
+        :param interval: number of steps between 2 checkpoints
+        """
+        if interval < 1:
+            raise Exception('checkpoint interval should be a positive integer')
+        self._interval = interval
+        self._lawn = Lawn(up_right_corner)
+        self._table = transition_table_for(up_right_corner, program_length(moving_program))
+        self._program = ''
+        # checkpoint i is the status after i * interval steps (encoded as a state of the table-driven core if any)
+        self._checkpoints = array('Q', [self._encode(initial_status)]) if self._table is not None \
+            else [initial_status]
+        self._final = self._checkpoints[0]
+        self.edit(0, moving_program)
+
+    def _encode(self, status):
+        return self._table.encode(*status) if self._table is not None else status
+
+    def _decode(self, state):
+        return self._table.decode(state) if self._table is not None else state
+
+    def _run(self, state, moving_program):
+        if self._table is not None:
+            return self._table.run(state, moving_program)
+        mower = Mower(state[0], state[1], self._lawn)
+        mower.move_multiple_steps(moving_program)
+        return mower.status
+
+    def _trace(self, state, moving_program):
+        if self._table is not None:
+            for state in self._table.trace(state, moving_program):
+                yield self._table.decode(state)
+        else:
+            mower = Mower(state[0], state[1], self._lawn)
+            for moving_code in moving_program:
+                mower.move_one_step(moving_code)
+                yield mower.status
+
+    @property
+    def program(self):
+        return self._program
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def checkpoints_count(self):
+        return len(self._checkpoints)
+
+    @property
+    def final_status(self):
+        """
+        :return: the status of the mower once the whole program has been applied
+        """
+        return self._decode(self._final)
+
+    def edit(self, offset, moving_program):
+        """
+        Replace the end of the program from an offset (the checkpoints of the unchanged steps are kept and the
+        simulation resumes from the last of them).
+        :param offset: first step changed (len(self) to append steps)
+        :param moving_program: new steps from offset (string of valid moving codes, repetition groups are expanded)
+        :return: the number of steps simulated again
+        """
+        if not 0 <= offset <= len(self._program):
+            raise Exception('offset {} is out of the program (length {})'.format(offset, len(self._program)))
+        moving_program = expand_program(moving_program)
+        if INVALID_MOVING_CODES_PATTERN.search(moving_program):
+            raise Exception('invalid moving codes in program {}'.format(moving_program))
+        self._program = self._program[:offset] + moving_program
+        # checkpoint i only depends on the steps before i * interval
+        del self._checkpoints[offset // self._interval + 1:]
+        resumed = (len(self._checkpoints) - 1) * self._interval
+        state = self._checkpoints[-1]
+        for start in range(resumed, len(self._program), self._interval):
+            state = self._run(state, self._program[start:start + self._interval])
+            if start + self._interval <= len(self._program):
+                self._checkpoints.append(state)
+        self._final = state
+        return len(self._program) - resumed
+
+    def append(self, moving_program):
+        """
+        Append steps to the program.
+        :param moving_program: steps to append (string of valid moving codes)
+        :return: the number of steps simulated again
+        """
+        return self.edit(len(self._program), moving_program)
+
+    def set_program(self, moving_program):
+        """
+        Replace the program (only the steps following the first changed step are simulated again).
+        :param moving_program: new program (string of valid moving codes)
+        :return: the number of steps simulated again
+        """
+        moving_program = expand_program(moving_program)
+        offset = 0
+        common_length = min(len(self._program), len(moving_program))
+        while offset < common_length and self._program[offset] == moving_program[offset]:
+            offset += 1
+        return self.edit(offset, moving_program[offset:])
+
+    def state_at(self, step_number):
+        """
+        :param step_number: number of steps applied (0 ==> initial status)
+        :return: the status of the mower after step_number steps (tuple (position, orientation))
+        """
+        if not 0 <= step_number <= len(self._program):
+            raise IndexError('step {} is out of the program (length {})'.format(step_number, len(self._program)))
+        checkpoint = step_number // self._interval
+        start = checkpoint * self._interval
+        return self._decode(self._run(self._checkpoints[checkpoint], self._program[start:step_number]))
+
+    def steps(self, start, stop):
+        """
+        Generator replaying the steps [start, stop[ from the nearest checkpoint.
+        :param start: first step
+        :param stop: step after the last step
+        :return: yields ((position, orientation), action) for each step
+        """
+        checkpoint = start // self._interval
+        replay_start = checkpoint * self._interval
+        state = self._checkpoints[checkpoint]
+        if replay_start < start:
+            state = self._run(state, self._program[replay_start:start])
+        for status, moving_code in zip(self._trace(state, self._program[start:stop]), self._program[start:stop]):
+            yield status, moving_code
+
+    def coordinates(self, start, stop):
+        """
+        :param start: first step
+        :param stop: step after the last step
+        :return: the lists of x and y coordinates of the mower after the steps [start, stop[
+        """
+        xs, ys = [], []
+        for status, _ in self.steps(start, stop):
+            xs.append(status[0][0])
+            ys.append(status[0][1])
+        return xs, ys
+
+    def __len__(self):
+        return len(self._program)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, stride = item.indices(len(self))
+            if stride != 1:
+                return [self[idx] for idx in range(start, stop, stride)]
+            return list(self.steps(start, stop)) if start < stop else []
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('history index out of range')
+        return self.state_at(item + 1), self._program[item]
+
+    def __iter__(self):
+        return self.steps(0, len(self))
@@ -0,0 +1,355 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: evaluation of a program from every start state at once.
+  Each moving code is a mapping over all the states of the grid (state = cell index * 4 + orientation index, see
+  statemachine), stored as a numpy array: map[state] is the state reached from state. Mappings are composed with
+  fancy indexing (applying first then second is second[first]) and runs of a same moving code are evaluated by repeated
+  squaring. A segment tree of the composed mappings of the program runs answers prefix queries in O(log n) mapping
+  compositions (or O(log n) lookups for a single start state).
+"""
+
+from bisect import bisect_right
+from itertools import groupby
+
+import numpy as np
+
+from mower import Mower, advance, expand_program, parse_program
+from statemachine import INVALID_MOVING_CODES_PATTERN, LEFT_SHIFTS, RIGHT_SHIFTS, decode_state, encode_state
+
+# memory budget of the mappings stored in a prefix segment tree (runs are grouped in blocks beyond)
+DEFAULT_TREE_MEMORY = 1 << 28
+
+# memory budget of the run mappings cached by a StateMaps object
+DEFAULT_CACHE_MEMORY = 1 << 24
+
+
+class StateMaps(object):
+    """
+    Mappings over all the states of a grid.
+    """
+
+    def __init__(self, up_right_corner=None, cache_memory=DEFAULT_CACHE_MEMORY):
+        """
+        Constructor. Build the mappings of the moving codes.
+        :param up_right_corner: upper right corner of the lawn grid (default: the grid of Mower.set_up_right_corner)
+        :param cache_memory: memory budget in bytes of the cached run mappings (see run_map)
+        """
+        up_right_corner = up_right_corner if up_right_corner is not None else Mower.GRID_UP_RIGHT_CORNER
+        if not Mower.is_valid_position(up_right_corner):
+            raise Exception('up_right_corner parameter should be a tuple2 with positive coordinates')
+        self._up_right = up_right_corner
+        self._width = up_right_corner[0] + 1
+        self._height = up_right_corner[1] + 1
+        states_count = self._width * self._height * 4
+        self._dtype = np.int32 if states_count < 1 << 31 else np.int64
+        states = np.arange(states_count, dtype=self._dtype)
+        headings = states & 3
+        y, x = np.divmod(states >> 2, self._width)
+        forward = states.copy()
+        north, east = 4 * self._width, 4
+        forward[(headings == 0) & (y < up_right_corner[1])] += north
+        forward[(headings == 1) & (x < up_right_corner[0])] += east
+        forward[(headings == 2) & (y > 0)] -= north
+        forward[(headings == 3) & (x > 0)] -= east
+        self._maps = {
+            'A': forward,
+            'G': states + np.array(LEFT_SHIFTS, dtype=self._dtype)[headings],
+            'D': states + np.array(RIGHT_SHIFTS, dtype=self._dtype)[headings],
+        }
+        self._identity = states
+        self._powers = {}
+        self._cache_memory = cache_memory
+        self._cached_bytes = 0
+
+    @property
+    def up_right_corner(self):
+        return self._up_right
+
+    @property
+    def states_count(self):
+        return len(self._identity)
+
+    @property
+    def identity(self):
+        return self._identity
+
+    @property
+    def cached_bytes(self):
+        return self._cached_bytes
+
+    def action_map(self, moving_code):
+        """
+        :param moving_code: 'A', 'G' or 'D'
+        :return: the mapping of the moving code
+        """
+        return self._maps[moving_code]
+
+    def encode(self, position, orientation):
+        """
+        :param position: position on the grid
+        :param orientation: orientation (among Mower.ORIENTATIONS)
+        :return: the state as an integer
+        """
+        return encode_state(self._up_right, position, orientation)
+
+    def decode(self, state):
+        """
+        :param state: state as an integer
+        :return: the mower status as a tuple (position, orientation)
+        """
+        return decode_state(self._up_right, int(state))
+
+    @staticmethod
+    def compose(first, second):
+        """
+        :param first: mapping applied first
+        :param second: mapping applied next
+        :return: the mapping applying first then second
+        """
+        return second[first]
+
+    def power(self, mapping, count):
+        """
+        Repeated squaring of a mapping.
+        :param mapping: a mapping
+        :param count: number of applications (>= 0)
+        :return: the mapping applying count times mapping
+        """
+        result = None
+        while count:
+            if count & 1:
+                result = mapping if result is None else mapping[result]
+            count >>= 1
+            if count:
+                mapping = mapping[mapping]
+        return self._identity if result is None else result
+
+    def run_map(self, moving_code, run_length):
+        """
+        :param moving_code: 'A', 'G' or 'D'
+        :param run_length: number of repetitions of the moving code
+        :return: the mapping of the run (swing runs are reduced modulo 4, mappings of runs are cached while they fit
+        in the memory budget of the object)
+        """
+        if moving_code != 'A':
+            run_length %= 4
+        key = (moving_code, run_length)
+        mapping = self._powers.get(key)
+        if mapping is None:
+            mapping = self.power(self._maps[moving_code], run_length)
+            # runs of length 0 or 1 are the identity or the action mapping (nothing to cache)
+            if run_length > 1 and self._cached_bytes + mapping.nbytes <= self._cache_memory:
+                self._powers[key] = mapping
+                self._cached_bytes += mapping.nbytes
+        return mapping
+
+    def run_state(self, state, moving_code, run_length):
+        """
+        Apply a run to a single state (scalar arithmetic, no mapping is built).
+        :param state: state as an integer
+        :param moving_code: 'A', 'G' or 'D'
+        :param run_length: number of repetitions of the moving code
+        :return: the state reached from state
+        """
+        (x, y), orientation = self.decode(state)
+        if moving_code == 'A':
+            target_coordinate, operand_2_add = Mower.MOVE_FORWARD_OPERATIONS[orientation]
+            if target_coordinate == 0:
+                x = advance(x, operand_2_add, run_length, self._up_right[0])
+            else:
+                y = advance(y, operand_2_add, run_length, self._up_right[1])
+            return (y * self._width + x) * 4 + (int(state) & 3)
+        return (int(state) & ~3) + (int(state) + Mower.SWING_OPERATIONS[moving_code] * run_length) % 4
+
+    def runs_map(self, runs, mapping=None):
+        """
+        :param runs: list of runs (moving code, run length)
+        :param mapping: mapping applied before the runs (default: identity)
+        :return: the mapping applying mapping then the runs
+        """
+        result = self._identity if mapping is None else mapping
+        for run in runs:
+            result = self.run_map(*run)[result]
+        return result
+
+    def items_map(self, items, mapping=None):
+        """
+        :param items: parsed program (see mower.parse_program)
+        :param mapping: mapping applied before the items (default: identity)
+        :return: the mapping applying mapping then the items (repetition groups are evaluated by repeated squaring)
+        """
+        result = self._identity if mapping is None else mapping
+        for item in items:
+            if isinstance(item, str):
+                result = self.runs_map(program_runs(item), result)
+            else:
+                result = self.power(self.items_map(item[0]), item[1])[result]
+        return result
+
+    def program_map(self, moving_program, times=1):
+        """
+        Evaluate a program from every start state.
+        :param moving_program: a string of valid moving codes (may hold repetition groups)
+        :param times: number of times the program is applied
+        :return: the mapping start state ==> final state
+        """
+        result = self.items_map(parse_program(moving_program)) if '(' in moving_program \
+            else self.runs_map(program_runs(moving_program))
+        return self.power(result, times) if times != 1 else result
+
+    def final_status_grid(self, moving_program, times=1):
+        """
+        :param moving_program: a string of valid moving codes
+        :param times: number of times the program is applied
+        :return: the arrays of final x, y and orientation index, indexed by start [y, x, orientation index]
+        """
+        final_states = self.program_map(moving_program, times).reshape(self._height, self._width, 4)
+        y, x = np.divmod(final_states >> 2, self._width)
+        return x, y, final_states & 3
+
+    def landing_heatmap(self, moving_program, times=1):
+        """
+        :param moving_program: a string of valid moving codes
+        :param times: number of times the program is applied
+        :return: an array [y, x] giving the number of start states (cell and orientation) ending in each cell
+        """
+        final_cells = self.program_map(moving_program, times) >> 2
+        return np.bincount(final_cells, minlength=self._width * self._height).reshape(self._height, self._width)
+
+
+def program_runs(moving_program):
+    """
+    :param moving_program: a string of valid moving codes
+    :return: the list of runs of identical moving codes as tuples (moving code, run length)
+    """
+    if INVALID_MOVING_CODES_PATTERN.search(moving_program):
+        raise Exception('invalid moving codes in program {}'.format(moving_program))
+    return [(moving_code, sum(1 for _ in run)) for moving_code, run in groupby(moving_program)]
+
+
+class PrefixMaps(object):
+    """
+    Segment tree of the mappings of the runs of a program: the mapping of any prefix of the program is the composition
+    of O(log n) tree nodes (n being the number of runs of identical moving codes) and of the runs of a partial block.
+    Runs are grouped in blocks (tree leaves) when the tree would not fit in the memory budget.
+    """
+
+    def __init__(self, state_maps, moving_program, block_runs=None, memory_limit=DEFAULT_TREE_MEMORY):
+        """
+        Constructor. Build the segment tree.
+        :param state_maps: a StateMaps object
+        :param moving_program: a string of valid moving codes (repetition groups are expanded)
+        :param block_runs: number of runs by tree leaf (default: the smallest one fitting in memory_limit)
+        :param memory_limit: memory budget of the tree in bytes (used when block_runs is not given)
+        """
+        self._maps = state_maps
+        moving_program = expand_program(moving_program)
+        self._length = len(moving_program)
+        self._runs = program_runs(moving_program)
+        self._run_starts = []
+        start = 0
+        for _, run_length in self._runs:
+            self._run_starts.append(start)
+            start += run_length
+        if block_runs is None:
+            max_leaves = max(1, memory_limit // (2 * state_maps.identity.nbytes))
+            block_runs = max(1, -(-len(self._runs) // max_leaves))
+        self._block_runs = block_runs
+        leaves_count = -(-len(self._runs) // block_runs)
+        self._size = 1
+        while self._size < leaves_count:
+            self._size *= 2
+        # tree[1] is the root, tree[size + i] is the leaf of block i, None is the identity (padding)
+        self._tree = [None] * (2 * self._size)
+        for idx in range(leaves_count):
+            block = self._runs[idx * block_runs:(idx + 1) * block_runs]
+            self._tree[self._size + idx] = state_maps.run_map(*block[0]) if block_runs == 1 \
+                else state_maps.runs_map(block)
+        for node in range(self._size - 1, 0, -1):
+            left, right = self._tree[2 * node], self._tree[2 * node + 1]
+            self._tree[node] = left if right is None else (right if left is None else right[left])
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def block_runs(self):
+        return self._block_runs
+
+    def _prefix_nodes(self, blocks_count):
+        """
+        :param blocks_count: number of whole blocks of the prefix
+        :return: the list of the tree nodes covering the blocks [0, blocks_count[ (in program order)
+        """
+        nodes = []
+        node, low, size = 1, 0, self._size
+        while blocks_count > low and size > 0:
+            if blocks_count >= low + size:
+                nodes.append(node)
+                break
+            size //= 2
+            if blocks_count >= low + size:
+                nodes.append(2 * node)
+                node, low = 2 * node + 1, low + size
+            else:
+                node = 2 * node
+        return nodes
+
+    def _split(self, step_number):
+        """
+        :param step_number: length of a prefix
+        :return: the number of whole blocks of the prefix, the list of the remaining whole runs and the partial run
+        ending the prefix (None if the prefix ends with a whole run)
+        """
+        if not 0 <= step_number <= self._length:
+            raise Exception('step {} is out of the program (length {})'.format(step_number, self._length))
+        runs_count = bisect_right(self._run_starts, step_number) - 1 if step_number < self._length \
+            else len(self._runs)
+        blocks_count = runs_count // self._block_runs
+        remaining = self._runs[blocks_count * self._block_runs:runs_count]
+        partial = None
+        if runs_count < len(self._runs) and step_number > self._run_starts[runs_count]:
+            partial = (self._runs[runs_count][0], step_number - self._run_starts[runs_count])
+        return blocks_count, remaining, partial
+
+    def prefix_map(self, step_number):
+        """
+        :param step_number: length of the prefix
+        :return: the mapping of the first step_number moving codes of the program
+        """
+        blocks_count, remaining, partial = self._split(step_number)
+        result = self._maps.identity
+        for node in self._prefix_nodes(blocks_count):
+            result = self._tree[node][result]
+        result = self._maps.runs_map(remaining, result)
+        if partial is not None:
+            # mappings of partial runs are not cached (any length may be queried)
+            moving_code, run_length = partial
+            result = self._maps.power(self._maps.action_map(moving_code),
+                                      run_length if moving_code == 'A' else run_length % 4)[result]
+        return result
+
+    def prefix_state(self, state, step_number):
+        """
+        :param state: start state
+        :param step_number: length of the prefix
+        :return: the state reached from state after the first step_number moving codes of the program (O(log n) tree
+        lookups, the runs following the last whole block are applied with scalar arithmetic)
+        """
+        blocks_count, remaining, partial = self._split(step_number)
+        for node in self._prefix_nodes(blocks_count):
+            state = self._tree[node][state]
+        state = int(state)
+        for run in remaining + ([partial] if partial is not None else []):
+            state = self._maps.run_state(state, *run)
+        return state
+
+    def prefix_status(self, position, orientation, step_number):
+        """
+        :param position: start position
+        :param orientation: start orientation
+        :param step_number: length of the prefix
+        :return: the mower status after the first step_number moving codes (tuple (position, orientation))
+        """
+        return self._maps.decode(self.prefix_state(self._maps.encode(position, orientation), step_number))
@@ -0,0 +1,216 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: vectorized (numpy based) simulation of a whole fleet of mowers.
+  Each mower status is held in numpy arrays (x, y and orientation index) and all the mowers are moved together, one
+  program step at a time.
+"""
+
+import numpy as np
+
+from mower import Mower, expand_program
+
+# action codes used to encode programs as numpy arrays
+ACTION_CODES = {'A': 0, 'G': 1, 'D': 2}
+NO_ACTION = 3  # padding code (end of a short program) or invalid moving code (ignored as in Mower.move_one_step)
+
+# lookup table: byte value of a moving code ==> action code
+ACTION_CODES_LUT = np.full(256, NO_ACTION, dtype=np.uint8)
+for _code, _value in ACTION_CODES.items():
+    ACTION_CODES_LUT[ord(_code)] = _value
+
+# orientation shift regarding the action code (same semantic as Mower.SWING_OPERATIONS)
+SWING_SHIFTS = np.array([0, Mower.SWING_OPERATIONS['G'], Mower.SWING_OPERATIONS['D'], 0], dtype=np.int8)
+
+# coordinates shifts when moving forward regarding the orientation index in Mower.ORIENTATIONS
+FORWARD_DX = np.array([0, 1, 0, -1], dtype=np.int64)
+FORWARD_DY = np.array([1, 0, -1, 0], dtype=np.int64)
+
+# memory budget of the action codes encoded at once by MowersFleet.run (programs are encoded window by window)
+ENCODING_CHUNK_BYTES = 1 << 24
+
+
+def encode_programs(programs):
+    """
+    Encode a list of programs as a 2D array of action codes. The array is stored step by step (one row per program
+    step, one column per mower) so that each simulation step reads a contiguous row. Shorter programs are padded with
+    NO_ACTION.
+    :param programs: list of programs (strings of moving codes, repetition groups are expanded)
+    :return: a numpy array of shape (longest program length, number of programs)
+    """
+    programs = [expand_program(program) for program in programs]
+    max_length = max([len(program) for program in programs]) if programs else 0
+    codes = np.full((max_length, len(programs)), NO_ACTION, dtype=np.uint8)
+    for idx, program in enumerate(programs):
+        # 'replace' keeps one byte per character (invalid characters become '?' hence NO_ACTION)
+        raw = np.frombuffer(program.encode('ascii', 'replace'), dtype=np.uint8)
+        codes[:len(raw), idx] = ACTION_CODES_LUT[raw]
+    return codes
+
+
+class MowersFleet(object):
+    """
+    Batch engine: holds the status of many mowers in numpy arrays and moves them all at once.
+    Final statuses are the same as the ones computed by Mower.move_multiple_steps.
+    """
+
+    def __init__(self, up_right_corner, positions, orientations):
+        """
+        Constructor.
+        :param up_right_corner: upper right corner of the lawn grid (tuple of 2 positive integers)
+        :param positions: list of initial positions (tuples of 2 positive integers)
+        :param orientations: list of initial orientations (among Mower.ORIENTATIONS)
+        """
+        if not Mower.is_valid_position(up_right_corner):
+            raise Exception('up_right_corner parameter should be a tuple2 with positive coordinates')
+        if len(positions) != len(orientations):
+            raise Exception('positions and orientations parameters should have the same length')
+        self._up_right = up_right_corner
+        coordinates = np.array(positions, dtype=np.int64).reshape(len(positions), 2)
+        self._x = coordinates[:, 0].copy()
+        self._y = coordinates[:, 1].copy()
+        self._heading = np.array([Mower.ORIENTATIONS.index(o) for o in orientations], dtype=np.int8)
+        self._blocked = None  # numbers of blocked forward moves by mower (see track_blocked_moves)
+
+    @classmethod
+    def from_mowers(cls, mowers, up_right_corner=None):
+        """
+        Build a fleet from a list of Mower objects.
+        :param mowers: list of Mower objects
+        :param up_right_corner: upper right corner of the lawn grid (default: the lawn grid of the first mower)
+        :return: a MowersFleet object
+        """
+        if up_right_corner is None:
+            up_right_corner = mowers[0].up_right_corner if mowers else Mower.GRID_UP_RIGHT_CORNER
+        return cls(up_right_corner, [m.position for m in mowers], [m.orientation for m in mowers])
+
+    @classmethod
+    def from_arrays(cls, up_right_corner, xs, ys, headings):
+        """
+        Build a fleet from numpy arrays (for instance the status table of a binary scenario, see binaryscenario).
+        :param up_right_corner: upper right corner of the lawn grid
+        :param xs: array of x coordinates
+        :param ys: array of y coordinates
+        :param headings: array of orientation indexes in Mower.ORIENTATIONS
+        :return: a MowersFleet object
+        """
+        fleet = cls(up_right_corner, [], [])
+        fleet._x = np.array(xs, dtype=np.int64)
+        fleet._y = np.array(ys, dtype=np.int64)
+        fleet._heading = np.array(headings, dtype=np.int8)
+        return fleet
+
+    def __len__(self):
+        return len(self._heading)
+
+    def track_blocked_moves(self):
+        """
+        Count the forward moves blocked at the grid edge from now on (see blocked_moves).
+        :return: None
+        """
+        self._blocked = np.zeros(len(self), dtype=np.int64)
+
+    @property
+    def blocked_moves(self):
+        """
+        :return: the list of the numbers of blocked forward moves by mower (None if they are not tracked)
+        """
+        return self._blocked.tolist() if self._blocked is not None else None
+
+    def step(self, codes, coverage=None):
+        """
+        Apply one action code to each mower of the fleet.
+        :param codes: numpy array of action codes (one by mower)
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells entered by the mowers
+        :return: None
+        """
+        self._heading += SWING_SHIFTS[codes]
+        self._heading %= 4
+        forward = codes == ACTION_CODES['A']
+        next_x = self._x + FORWARD_DX[self._heading] * forward
+        next_y = self._y + FORWARD_DY[self._heading] * forward
+        # boundary clamping: a move which would leave the grid is ignored
+        inside_x = (next_x >= 0) & (next_x <= self._up_right[0])
+        inside_y = (next_y >= 0) & (next_y <= self._up_right[1])
+        np.copyto(self._x, next_x, where=inside_x)
+        np.copyto(self._y, next_y, where=inside_y)
+        if self._blocked is not None:
+            self._blocked += forward & ~(inside_x & inside_y)
+        if coverage is not None:
+            moved = forward & (self._x == next_x) & (self._y == next_y)
+            coverage.visit_many(self._x[moved], self._y[moved])
+
+    def run(self, programs, coverage=None, chunk_bytes=ENCODING_CHUNK_BYTES):
+        """
+        Apply a program to each mower of the fleet (all the mowers are moved together step by step).
+        Programs given as strings are encoded by windows of steps fitting in chunk_bytes, and only the mowers whose
+        program is not over are moved in a window (a long program does not pad all the others).
+        :param programs: list of programs (strings of moving codes, one by mower) or an already encoded array of
+                         action codes (see encode_programs)
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells entered by the mowers (the
+                         initial cells of the mowers are not recorded)
+        :param chunk_bytes: memory budget of the action codes encoded at once
+        :return: None
+        """
+        if isinstance(programs, np.ndarray):
+            if programs.shape[1] != len(self):
+                raise Exception('one program by mower is expected')
+            self.run_codes(programs, coverage=coverage)
+            return
+        if len(programs) != len(self):
+            raise Exception('one program by mower is expected')
+        programs = [expand_program(program) for program in programs]
+        lengths = np.array([len(program) for program in programs], dtype=np.int64)
+        start = 0
+        active = np.flatnonzero(lengths > start)
+        while len(active):
+            window = max(1, chunk_bytes // len(active))
+            self.run_codes(encode_programs([programs[idx][start:start + window] for idx in active]), active, coverage)
+            start += window
+            active = active[lengths[active] > start]
+
+    def run_codes(self, codes, mowers=None, coverage=None):
+        """
+        Apply encoded action codes to some mowers of the fleet (the other mowers do not move).
+        :param codes: numpy array of action codes (one row per step, one column per moved mower)
+        :param mowers: sorted numpy array of the indexes of the moved mowers (default: all the mowers)
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells entered by the mowers
+        :return: None
+        """
+        if mowers is None or len(mowers) == len(self):
+            fleet = self
+        else:
+            fleet = MowersFleet.from_arrays(self._up_right, self._x[mowers], self._y[mowers], self._heading[mowers])
+            if self._blocked is not None:
+                fleet._blocked = self._blocked[mowers]
+        for row in codes:
+            fleet.step(row, coverage)
+        if fleet is not self:
+            self._x[mowers], self._y[mowers], self._heading[mowers] = fleet._x, fleet._y, fleet._heading
+            if self._blocked is not None:
+                self._blocked[mowers] = fleet._blocked
+
+    @property
+    def all_status(self):
+        """
+        Fleet status accessor.
+        :return: a list of mower status (tuples (position, orientation) as Mower.status)
+        """
+        return [((int(x), int(y)), Mower.ORIENTATIONS[h])
+                for x, y, h in zip(self._x.tolist(), self._y.tolist(), self._heading.tolist())]
+
+    def get_str_status(self):
+        """
+        :return: the list of mower status as strings (same format as Mower.get_str_status)
+        """
+        return ['{} {} {}'.format(position[0], position[1], orientation)
+                for position, orientation in self.all_status]
+
+    def update_mowers(self, mowers):
+        """
+        Write back the fleet status into Mower objects (the fleet should have been built from these mowers).
+        :param mowers: list of Mower objects
+        :return: None
+        """
+        for mower, status in zip(mowers, self.all_status):
+            mower.set_status(status[0], status[1])
@@ -0,0 +1,125 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: compact history of the steps executed by a mower.
+  Steps are stored in typed arrays (x and y coordinates as small unsigned integers, orientation and action as 2-bit
+  codes packed in one byte) instead of nested tuples.
+"""
+
+import sys
+from array import array
+
+from mower import Mower
+
+ACTIONS = ['A', 'G', 'D']
+ACTION_INDEXES = {action: idx for idx, action in enumerate(ACTIONS)}
+
+
+def coordinate_typecode(max_coordinate):
+    """
+    Choose the smallest unsigned typecode (array module) able to store coordinates up to max_coordinate.
+    :param max_coordinate: greatest coordinate to store
+    :return: a typecode
+    """
+    for typecode in ['B', 'H', 'I', 'L', 'Q']:
+        if max_coordinate < 1 << (8 * array(typecode).itemsize):
+            return typecode
+    raise Exception('coordinate {} is too large'.format(max_coordinate))
+
+
+class MowerHistory(object):
+    """
+    History of the steps executed by a mower. Indexed access gives the same items as the lists built by
+    MowersTestPlayer.apply(with_history=True) before: ((position, orientation), action).
+    """
+
+    def __init__(self, up_right_corner):
+        """
+        Constructor.
+        :param up_right_corner: upper right corner of the lawn grid (gives the size of the coordinates)
+        """
+        typecode = coordinate_typecode(max(up_right_corner))
+        self._width = up_right_corner[0] + 1
+        self._x = array(typecode)
+        self._y = array(typecode)
+        self._codes = bytearray()  # orientation index in bits 0-1, action index in bits 2-3
+
+    def append(self, status, action):
+        """
+        Record a step.
+        :param status: mower status after the step (tuple (position, orientation))
+        :param action: moving code applied ('A', 'G' or 'D')
+        :return: None
+        """
+        self._x.append(status[0][0])
+        self._y.append(status[0][1])
+        self._codes.append(Mower.ORIENTATION_INDEXES[status[1]] | ACTION_INDEXES[action] << 2)
+
+    def append_state(self, state, action):
+        """
+        Record a step from a state of the table-driven core (see statemachine.TransitionTable).
+        :param state: state after the step (cell index * 4 + orientation index)
+        :param action: moving code applied ('A', 'G' or 'D')
+        :return: None
+        """
+        y, x = divmod(state >> 2, self._width)
+        self._x.append(x)
+        self._y.append(y)
+        self._codes.append(state & 3 | ACTION_INDEXES[action] << 2)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[idx] for idx in range(*item.indices(len(self)))]
+        code = self._codes[item]
+        return ((self._x[item], self._y[item]), Mower.ORIENTATIONS[code & 3]), ACTIONS[code >> 2]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def coordinates(self, start, stop):
+        """
+        :param start: first step
+        :param stop: step after the last step
+        :return: the arrays of x and y coordinates of the mower after the steps [start, stop[
+        """
+        return self._x[start:stop], self._y[start:stop]
+
+    @property
+    def nbytes(self):
+        """
+        Memory footprint of the history.
+        :return: the size in bytes of the history buffers (including the Python objects overhead)
+        """
+        return sys.getsizeof(self._x) + sys.getsizeof(self._y) + sys.getsizeof(self._codes)
+
+    def to_numpy(self):
+        """
+        Numpy arrays of the history: x and y are views on the history buffers (no copy: do not record new steps while
+        the views are used), orientation and action indexes are new arrays unpacked from the codes buffer.
+        :return: a tuple of numpy arrays (x, y, orientation index, action index)
+        """
+        import numpy as np
+        x = np.frombuffer(self._x, dtype=np.dtype(self._x.typecode))
+        y = np.frombuffer(self._y, dtype=np.dtype(self._y.typecode))
+        codes = np.frombuffer(self._codes, dtype=np.uint8)
+        return x, y, codes & 3, codes >> 2
+
+    def save_npy(self, file_prefix):
+        """
+        Export the history buffers as .npy files (buffers are written without intermediate copy): <file_prefix>_x.npy,
+        <file_prefix>_y.npy and <file_prefix>_codes.npy (orientation index in bits 0-1, action index in bits 2-3).
+        :param file_prefix: path prefix of the files to write
+        :return: the list of written files
+        """
+        import numpy as np
+        files = []
+        for name, buffer, dtype in [('x', self._x, self._x.typecode), ('y', self._y, self._y.typecode),
+                                    ('codes', self._codes, 'B')]:
+            file_name = '{}_{}.npy'.format(file_prefix, name)
+            np.save(file_name, np.frombuffer(buffer, dtype=np.dtype(dtype)))
+            files.append(file_name)
+        return files
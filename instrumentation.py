@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: optional instrumentation of the test player.
+  A PlayerStats object given to MowersTestPlayer collects the wall time of each phase (parse, simulate, history) and
+  counters (steps, turns and forward moves blocked at the grid edge, in total and by mower). When no stats object is
+  given, the player runs its uninstrumented code paths.
+"""
+
+import json
+import time
+
+from mower import Mower, count_moving_codes
+
+
+class PlayerStats(object):
+    """
+    Statistics collected by an instrumented MowersTestPlayer.
+    """
+
+    def __init__(self, keep_per_mower=True):
+        """
+        Constructor.
+        :param keep_per_mower: if True, counters are also kept for each mower
+        """
+        self._keep_per_mower = keep_per_mower
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all the statistics.
+        :return: None
+        """
+        self._phases = {}
+        self._mowers = 0
+        self._steps = 0
+        self._turns = 0
+        self._blocked_moves = 0
+        self._per_mower = []
+
+    def start(self):
+        """
+        :return: a start time for add_phase_time
+        """
+        return time.perf_counter()
+
+    def add_phase_time(self, phase, start):
+        """
+        Add the time elapsed since start to a phase.
+        :param phase: phase name ('parse', 'simulate' or 'history')
+        :param start: start time (see start)
+        :return: None
+        """
+        self._phases[phase] = self._phases.get(phase, 0.0) + time.perf_counter() - start
+
+    def record_mower(self, moving_program, blocked_moves):
+        """
+        Record the counters of a mower once its program has been applied.
+        :param moving_program: program applied
+        :param blocked_moves: number of forward moves blocked at the grid edge
+        :return: None
+        """
+        counts = count_moving_codes(moving_program)
+        steps, turns = sum(counts.values()), counts['G'] + counts['D']
+        self._mowers += 1
+        self._steps += steps
+        self._turns += turns
+        self._blocked_moves += blocked_moves
+        if self._keep_per_mower:
+            self._per_mower.append({'steps': steps, 'turns': turns, 'blocked_moves': blocked_moves})
+
+    @property
+    def phases(self):
+        return self._phases
+
+    @property
+    def steps(self):
+        return self._steps
+
+    @property
+    def turns(self):
+        return self._turns
+
+    @property
+    def blocked_moves(self):
+        return self._blocked_moves
+
+    @property
+    def per_mower(self):
+        return self._per_mower
+
+    @property
+    def steps_per_second(self):
+        """
+        :return: number of steps simulated by second (simulate and history phases)
+        """
+        elapsed = self._phases.get('simulate', 0.0) + self._phases.get('history', 0.0)
+        return self._steps / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {'phases': dict(self._phases), 'mowers': self._mowers, 'steps': self._steps,
+                'steps_per_second': self.steps_per_second, 'turns': self._turns,
+                'blocked_moves': self._blocked_moves, 'per_mower': list(self._per_mower)}
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+def count_blocked_moves(lawn, status, moving_program):
+    """
+    Count the forward moves blocked at the grid edge when applying a program (used by the code paths which do not
+    count them while simulating).
+    :param lawn: lawn of the mower
+    :param status: initial status of the mower
+    :param moving_program: program to apply
+    :return: the number of blocked forward moves
+    """
+    return Mower(status[0], status[1], lawn).move_multiple_steps(moving_program)
@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: simulation context of a grid lawn.
+  A Lawn owns its grid bounds and its mowers, so that many lawns (scenarios) can be simulated side by side (in threads
+  or in a process pool) without sharing the Mower.GRID_UP_RIGHT_CORNER class attribute.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from mower import Mower
+
+
+class Lawn(object):
+    """
+    A grid lawn with its mowers (and the program to apply to each mower).
+    """
+
+    def __init__(self, up_right_corner):
+        """
+        Constructor.
+        :param up_right_corner: upper right corner of the lawn grid (tuple of 2 positive integers)
+        """
+        if Mower.is_valid_position(up_right_corner):
+            self._up_right = up_right_corner
+        else:
+            raise Exception('up_right_corner parameter should be a tuple2 with positive coordinates')
+        self._mowers = []           # list of tuples (Mower, program)
+        self._final_status = []     # list of final mower status when the programs have been applied
+
+    @property
+    def up_right_corner(self):
+        return self._up_right
+
+    @property
+    def mowers(self):
+        return self._mowers
+
+    @property
+    def all_status(self):
+        return self._final_status
+
+    def add_mower(self, position, orientation, program=''):
+        """
+        Create a mower moving on this lawn.
+        :param position: initial position of the mower
+        :param orientation: initial orientation of the mower
+        :param program: program to apply to the mower
+        :return: the new Mower object
+        """
+        mower = Mower(position, orientation, self)
+        self._mowers.append((mower, program))
+        return mower
+
+    def apply(self):
+        """
+        Apply the program of each mower of the lawn.
+        :return: the list of final status of the mowers as strings
+        """
+        self._final_status = []
+        for tmover in self._mowers:
+            tmover[0].move_multiple_steps(tmover[1])
+            self._final_status.append(tmover[0].get_str_status())
+        return self.all_status
+
+
+def apply_lawn(lawn):
+    """
+    Apply a lawn (function usable by a process pool).
+    :param lawn: a Lawn object
+    :return: the list of final status of the lawn mowers as strings
+    """
+    return lawn.apply()
+
+
+def apply_lawns(lawns, executor=None):
+    """
+    Apply many lawns side by side.
+    :param lawns: list of Lawn objects
+    :param executor: a concurrent.futures executor (default: a ThreadPoolExecutor). With a ProcessPoolExecutor,
+                     lawns are applied on copies in the worker processes (the mowers of the lawns are not updated).
+    :return: the list of final status (as lists of strings) of each lawn
+    """
+    if executor is None:
+        with ThreadPoolExecutor() as thread_executor:
+            return list(thread_executor.map(apply_lawn, lawns))
+    return list(executor.map(apply_lawn, lawns))
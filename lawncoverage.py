@@ -0,0 +1,189 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: lawn coverage (which cells were mowed and how often).
+  Visits are recorded while the mowers move (no step history is needed): the initial cell of a mower counts as one
+  visit, then each forward move counts as one visit of the cell the mower enters (swings and blocked moves do not
+  count).
+  Moderate grids use a dense numpy counter, very large grids a sparse dictionary of the visited cells.
+"""
+
+import numpy as np
+
+DENSE_LIMIT = 1 << 24  # greatest number of cells for a dense coverage
+
+
+class DenseCoverage(object):
+    """
+    Visit counters of all the cells of the grid (numpy array indexed by [y, x] as the grid_lawn array of MowersViz).
+    """
+
+    def __init__(self, up_right_corner):
+        """
+        Constructor.
+        :param up_right_corner: upper right corner of the lawn grid
+        """
+        self._up_right = up_right_corner
+        self._counts = np.zeros((up_right_corner[1] + 1, up_right_corner[0] + 1), dtype=np.uint32)
+
+    @property
+    def cells_count(self):
+        return self._counts.size
+
+    @property
+    def visited_cells(self):
+        return int(np.count_nonzero(self._counts))
+
+    def visit(self, x, y):
+        self._counts[y, x] += 1
+
+    def visit_run(self, x, y, dx, dy, length):
+        """
+        Record the cells entered by a run of forward moves.
+        :param x: coordinate of the cell the run starts from (not visited by the run)
+        :param y: coordinate of the cell the run starts from (not visited by the run)
+        :param dx: shift of x by move (-1, 0 or 1)
+        :param dy: shift of y by move (-1, 0 or 1)
+        :param length: number of moves of the run
+        :return: None
+        """
+        if dx > 0:
+            self._counts[y, x + 1:x + 1 + length] += 1
+        elif dx < 0:
+            self._counts[y, x - length:x] += 1
+        elif dy > 0:
+            self._counts[y + 1:y + 1 + length, x] += 1
+        elif dy < 0:
+            self._counts[y - length:y, x] += 1
+
+    def visit_many(self, xs, ys, visits=1):
+        """
+        Record visits[i] visits (default: one visit) for each (xs[i], ys[i]) cell (numpy arrays, a cell may appear
+        many times).
+        """
+        np.add.at(self._counts, (ys, xs), np.asarray(visits).astype(self._counts.dtype))
+
+    def count(self, x, y):
+        return int(self._counts[y, x])
+
+    def coverage_ratio(self):
+        """
+        :return: the ratio of visited cells
+        """
+        return self.visited_cells / self.cells_count
+
+    def heatmap(self):
+        """
+        :return: the visit counters as a numpy array indexed by [y, x]
+        """
+        return self._counts
+
+    def save_heatmap(self, file_name):
+        """
+        Export the visit counters as a .npy file.
+        :param file_name: file to write
+        :return: None
+        """
+        np.save(file_name, self.heatmap())
+
+
+class SparseCoverage(object):
+    """
+    Visit counters of the visited cells only (dictionary cell index ==> visits), for very large grids.
+    """
+
+    def __init__(self, up_right_corner):
+        """
+        Constructor.
+        :param up_right_corner: upper right corner of the lawn grid
+        """
+        self._up_right = up_right_corner
+        self._width = up_right_corner[0] + 1
+        self._counts = {}
+
+    @property
+    def cells_count(self):
+        return self._width * (self._up_right[1] + 1)
+
+    @property
+    def visited_cells(self):
+        return len(self._counts)
+
+    def visit(self, x, y):
+        cell = y * self._width + x
+        self._counts[cell] = self._counts.get(cell, 0) + 1
+
+    def visit_run(self, x, y, dx, dy, length):
+        """
+        Record the cells entered by a run of forward moves (see DenseCoverage.visit_run).
+        """
+        counts = self._counts
+        cell = y * self._width + x
+        shift = dx + dy * self._width
+        for _ in range(length):
+            cell += shift
+            counts[cell] = counts.get(cell, 0) + 1
+
+    def visit_many(self, xs, ys, visits=1):
+        """
+        Record visits for many cells (see DenseCoverage.visit_many).
+        """
+        counts = self._counts
+        cells = (np.asarray(ys, dtype=np.int64) * self._width + xs).tolist()
+        for cell, cell_visits in zip(cells, np.broadcast_to(visits, len(cells)).tolist()):
+            counts[cell] = counts.get(cell, 0) + cell_visits
+
+    def count(self, x, y):
+        return self._counts.get(y * self._width + x, 0)
+
+    def coverage_ratio(self):
+        """
+        :return: the ratio of visited cells
+        """
+        return self.visited_cells / self.cells_count
+
+    def to_coo(self):
+        """
+        :return: the visited cells as numpy arrays (x, y, visits)
+        """
+        cells = np.fromiter(self._counts.keys(), dtype=np.int64, count=len(self._counts))
+        visits = np.fromiter(self._counts.values(), dtype=np.int64, count=len(self._counts))
+        return cells % self._width, cells // self._width, visits
+
+    def heatmap(self, max_cells=DENSE_LIMIT):
+        """
+        Dense heatmap of the bounding box of the visited cells.
+        :param max_cells: greatest size of the heatmap
+        :return: a tuple (heatmap as a numpy array indexed by [y - y_min, x - x_min], (x_min, y_min))
+        """
+        xs, ys, visits = self.to_coo()
+        if len(visits) == 0:
+            return np.zeros((0, 0), dtype=np.uint32), (0, 0)
+        x_min, y_min = int(xs.min()), int(ys.min())
+        shape = (int(ys.max()) - y_min + 1, int(xs.max()) - x_min + 1)
+        if shape[0] * shape[1] > max_cells:
+            raise Exception('heatmap of {}x{} cells is too large'.format(shape[1], shape[0]))
+        counts = np.zeros(shape, dtype=np.uint32)
+        counts[ys - y_min, xs - x_min] = visits
+        return counts, (x_min, y_min)
+
+    def save_heatmap(self, file_name):
+        """
+        Export the visited cells as a .npz file (x, y and visits arrays).
+        :param file_name: file to write
+        :return: None
+        """
+        xs, ys, visits = self.to_coo()
+        np.savez(file_name, x=xs, y=ys, visits=visits)
+
+
+def make_coverage(up_right_corner, dense_limit=DENSE_LIMIT):
+    """
+    Create a coverage suited to the size of the grid.
+    :param up_right_corner: upper right corner of the lawn grid
+    :param dense_limit: greatest number of cells for a dense coverage
+    :return: a DenseCoverage or a SparseCoverage object
+    """
+    if (up_right_corner[0] + 1) * (up_right_corner[1] + 1) <= dense_limit:
+        return DenseCoverage(up_right_corner)
+    return SparseCoverage(up_right_corner)
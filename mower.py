@@ -2,16 +2,37 @@
 
 """
   Xebia exercice: Robotic mower moving on a grid lawn modelization.
+  Programs may hold repetition groups: "(AAD)1000000" repeats AAD 1000000 times (groups can be nested). Grouped
+  programs are executed without expansion: when the mower status at the start of an iteration repeats, the remaining
+  iterations are skipped cycle by cycle.
 """
 
+import re
+
+# a program is compiled as a sequence of runs of moving codes: either a run of swings or a run of forward moves
+# (any other character is ignored as in Mower.move_one_step)
+PROGRAM_RUNS_PATTERN = re.compile('[DG]+|A+')
+
+# repetition groups syntax: '(' program ')' count
+MOVING_CODES_RUN_PATTERN = re.compile('[ADG]+')
+REPETITION_COUNT_PATTERN = re.compile('\\d+')
+
+# greatest number of steps of a program expanded for the engines working step by step (see expand_program)
+MAX_EXPANDED_LENGTH = 1 << 24
+
 
 class Mower(object):
 
+    __slots__ = ('_position', '_orientation', '_lawn')
+
     GRID_UP_RIGHT_CORNER = None  # should hold upper right corner of the grid ( via set_up_right_corner method)
 
     # list of valid orientations (!!! keep this order to insure proper swing operations !!!)
     ORIENTATIONS = ['N', 'E', 'S', 'W']
 
+    # orientation ==> index in the ORIENTATIONS list (avoids ORIENTATIONS.index calls when swinging)
+    ORIENTATION_INDEXES = {orientation: idx for idx, orientation in enumerate(ORIENTATIONS)}
+
     # list of (coordinate, operation) to perform when moving the mower forward regarding ORIENTATIONS list
     # for instance 'W': (0, -1) means that if the mower's position is 'N' and if the mower should move forward,
     # we should operate on the first coordinate (index 0 or x) and add it -1
@@ -66,20 +87,17 @@ class Mower(object):
         else:
             raise Exception('up_right_corner parameter should be a tuple2 with positive coordinates')
 
-    def __init__(self, position, orientation):
+    def __init__(self, position, orientation, lawn=None):
         """
         Mower constructor. set initial position and orientation for the mower.
         :param position: initial position
         :param orientation: initial orientation
+        :param lawn: lawn (see lawn.Lawn) providing the grid upper right corner (optional, if not provided the
+                     Mower.GRID_UP_RIGHT_CORNER class attribute is used)
         """
-        if Mower.is_valid_position(position):
-            self._position = position
-        else:
-            raise Exception('position parameter should be a tuple2 with positive coordinates')
-        if Mower.is_valid_orientation(orientation):
-            self._orientation = orientation
-        else:
-            raise Exception('orientation parameter should be among {}'.format(Mower.ORIENTATIONS))
+        self._position, self._orientation = None, None
+        self._lawn = lawn
+        self.set_status(position, orientation)
 
     @property
     def position(self):
@@ -97,6 +115,14 @@ class Mower(object):
         """
         return self._orientation
 
+    @property
+    def up_right_corner(self):
+        """
+        Upper right corner of the lawn grid the mower is moving on.
+        :return: the upper right corner of the mower's lawn if any, else Mower.GRID_UP_RIGHT_CORNER
+        """
+        return self._lawn.up_right_corner if self._lawn is not None else Mower.GRID_UP_RIGHT_CORNER
+
     @property
     def status(self):
         """
@@ -105,6 +131,22 @@ class Mower(object):
         """
         return self.position, self.orientation
 
+    def set_status(self, position, orientation):
+        """
+        Mower status mutator (used by batch engines to write back a computed status).
+        :param position: new position
+        :param orientation: new orientation
+        :return: None
+        """
+        if Mower.is_valid_position(position):
+            self._position = position
+        else:
+            raise Exception('position parameter should be a tuple2 with positive coordinates')
+        if Mower.is_valid_orientation(orientation):
+            self._orientation = orientation
+        else:
+            raise Exception('orientation parameter should be among {}'.format(Mower.ORIENTATIONS))
+
     def get_str_status(self):
         return '{} {} {}'.format(self.position[0], self.position[1], self.orientation)
 
@@ -114,14 +156,15 @@ class Mower(object):
         Computes the new position of the mower.
         :return: None
         """
-        if Mower.is_valid_position(Mower.GRID_UP_RIGHT_CORNER):
-            coordinates = list(self._position)
-            target_coordinate = Mower.MOVE_FORWARD_OPERATIONS[self.orientation][0]
-            operand_2_add = Mower.MOVE_FORWARD_OPERATIONS[self.orientation][1]
-            next_coordinate = self.position[target_coordinate] + operand_2_add
-            if 0 <= next_coordinate <= Mower.GRID_UP_RIGHT_CORNER[target_coordinate]:
-                coordinates[target_coordinate] = next_coordinate
-                self._position = tuple(coordinates)
+        up_right = self.up_right_corner
+        if Mower.is_valid_position(up_right):
+            target_coordinate, operand_2_add = Mower.MOVE_FORWARD_OPERATIONS[self._orientation]
+            next_coordinate = self._position[target_coordinate] + operand_2_add
+            if 0 <= next_coordinate <= up_right[target_coordinate]:
+                if target_coordinate == 0:
+                    self._position = (next_coordinate, self._position[1])
+                else:
+                    self._position = (self._position[0], next_coordinate)
         else:
             raise Exception('Mower.GRID_UP_RIGHT_CORNER should be defined (use Mower.set_up_right_corner method)')
 
@@ -132,7 +175,7 @@ class Mower(object):
         :param moving_code: 'G' or 'D'
         :return: None
         """
-        current_orientation_index = Mower.ORIENTATIONS.index(self.orientation)
+        current_orientation_index = Mower.ORIENTATION_INDEXES[self._orientation]
         next_orientation_index = (current_orientation_index + Mower.SWING_OPERATIONS[moving_code]) \
                                  % len(Mower.ORIENTATIONS)
         self._orientation = Mower.ORIENTATIONS[next_orientation_index]
@@ -150,12 +193,244 @@ class Mower(object):
             else:
                 self.swing(moving_code)
 
-    def move_multiple_steps(self, moving_program):
+    def move_compiled(self, segments, coverage=None):
+        """
+        Apply a compiled program (see compile_program) to the mower. Each forward run is applied at once, so the cost
+        depends on the number of turns in the program, not on its length.
+        :param segments: list of (orientation shift, forward run length) tuples
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells entered by the mower
+        :return: the number of forward moves blocked at the grid edge
+        """
+        up_right = self.up_right_corner
+        if not Mower.is_valid_position(up_right):
+            raise Exception('Mower.GRID_UP_RIGHT_CORNER should be defined (use Mower.set_up_right_corner method)')
+        x, y = self._position
+        orientation_index = Mower.ORIENTATION_INDEXES[self._orientation]
+        up_right_x, up_right_y = up_right
+        blocked_moves = 0
+        for shift, run_length in segments:
+            orientation_index = (orientation_index + shift) % 4
+            if run_length > 0:
+                orientation = Mower.ORIENTATIONS[orientation_index]
+                target_coordinate, operand_2_add = Mower.MOVE_FORWARD_OPERATIONS[orientation]
+                if target_coordinate == 0:
+                    next_x = advance(x, operand_2_add, run_length, up_right_x)
+                    if coverage is not None and next_x != x:
+                        coverage.visit_run(x, y, operand_2_add, 0, abs(next_x - x))
+                    blocked_moves += run_length - abs(next_x - x)
+                    x = next_x
+                else:
+                    next_y = advance(y, operand_2_add, run_length, up_right_y)
+                    if coverage is not None and next_y != y:
+                        coverage.visit_run(x, y, 0, operand_2_add, abs(next_y - y))
+                    blocked_moves += run_length - abs(next_y - y)
+                    y = next_y
+        self._position = (x, y)
+        self._orientation = Mower.ORIENTATIONS[orientation_index]
+        return blocked_moves
+
+    def move_groups(self, items, coverage=None):
+        """
+        Apply a compiled program with repetition groups (see compile_groups). For each group, the mower status at the
+        start of each iteration is recorded: once a status repeats, the whole cycles left are skipped (their blocked
+        moves are counted arithmetically). When a coverage is given, the visits of one cycle are recorded in a scratch
+        coverage and added once multiplied by the number of skipped cycles (every visit is still counted).
+        :param items: list of segments lists and (items, count) groups
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells entered by the mower
+        :return: the number of forward moves blocked at the grid edge
+        """
+        blocked_moves = 0
+        for item in items:
+            if isinstance(item, list):
+                blocked_moves += self.move_compiled(item, coverage)
+                continue
+            body, count = item
+            iteration = 0
+            seen = {}  # status ==> (iteration, blocked moves) at the iteration start
+            while iteration < count:
+                if seen is not None:
+                    status = (self._position, self._orientation)
+                    if status in seen:
+                        first_iteration, first_blocked_moves = seen[status]
+                        period = iteration - first_iteration
+                        cycles = (count - iteration) // period
+                        if coverage is not None and cycles > 0:
+                            self._cover_cycles(body, period, cycles, coverage)
+                        iteration += cycles * period
+                        blocked_moves += cycles * (blocked_moves - first_blocked_moves)
+                        seen = None  # less than one cycle left
+                        continue
+                    seen[status] = (iteration, blocked_moves)
+                blocked_moves += self.move_groups(body, coverage)
+                iteration += 1
+        return blocked_moves
+
+    def _cover_cycles(self, body, period, cycles, coverage):
+        """
+        Record the visits of skipped cycles of a repetition group (the mower status is the same after one cycle).
+        :param body: items of the group
+        :param period: number of iterations of a cycle
+        :param cycles: number of skipped cycles
+        :param coverage: lawn coverage (see lawncoverage)
+        :return: None
+        """
+        from lawncoverage import SparseCoverage  # numpy is only loaded by coverage users
+        cycle_coverage = SparseCoverage(self.up_right_corner)
+        for _ in range(period):
+            self.move_groups(body, cycle_coverage)
+        xs, ys, visits = cycle_coverage.to_coo()
+        coverage.visit_many(xs, ys, visits * cycles)
+
+    def move_multiple_steps(self, moving_program, coverage=None):
         """
         Apply a set of moving code to the mower.
         Computes the next status (position + orientation) of the mower).
-        :param moving_program: a string as a list of moving codes
-        :return: None
+        :param moving_program: a string as a list of moving codes (may hold repetition groups, see parse_program)
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells entered by the mower
+        :return: the number of forward moves blocked at the grid edge
         """
-        for action in moving_program:
-            self.move_one_step(action)
+        if '(' in moving_program:
+            return self.move_groups(compile_groups(parse_program(moving_program)), coverage)
+        return self.move_compiled(compile_program(moving_program), coverage)
+
+
+def compile_program(moving_program):
+    """
+    Compile a program into a compact list of segments. A segment is a tuple (orientation shift, forward run length):
+    the orientation shift (in [0, 3], to add modulo 4 to the orientation index in Mower.ORIENTATIONS) is applied first,
+    then the mower moves forward run length times. For instance "AAAAGGDAAD" is compiled as [(0, 4), (3, 2), (1, 0)].
+    :param moving_program: a string as a list of moving codes
+    :return: the list of segments
+    """
+    segments = []
+    shift = 0
+    for run in PROGRAM_RUNS_PATTERN.findall(moving_program):
+        if run[0] == 'A':
+            if shift == 0 and segments:
+                # no swing since the previous forward run (ignored characters between both runs)
+                segments[-1] = (segments[-1][0], segments[-1][1] + len(run))
+            else:
+                segments.append((shift, len(run)))
+                shift = 0
+        else:
+            shift = (shift + run.count('D') * Mower.SWING_OPERATIONS['D']
+                     + run.count('G') * Mower.SWING_OPERATIONS['G']) % 4
+    if shift != 0:
+        segments.append((shift, 0))
+    return segments
+
+
+def parse_program(moving_program):
+    """
+    Parse a program with repetition groups (without expanding it). For instance "A(GA(D)2)3" is parsed as
+    ['A', (['GA', (['D'], 2)], 3)].
+    :param moving_program: a string of moving codes and repetition groups: '(' program ')' count
+    :return: the list of items: runs of moving codes (strings) and groups (tuples (items, count))
+    """
+    stack = [[]]
+    offset = 0
+    while offset < len(moving_program):
+        character = moving_program[offset]
+        if character == '(':
+            stack.append([])
+            offset += 1
+        elif character == ')':
+            if len(stack) == 1:
+                raise Exception('unbalanced ")" at offset {} of program'.format(offset))
+            matcher = REPETITION_COUNT_PATTERN.match(moving_program, offset + 1)
+            if matcher is None:
+                raise Exception('repetition count expected at offset {} of program'.format(offset + 1))
+            body = stack.pop()
+            stack[-1].append((body, int(matcher.group())))
+            offset = matcher.end()
+        else:
+            matcher = MOVING_CODES_RUN_PATTERN.match(moving_program, offset)
+            if matcher is None:
+                raise Exception('invalid moving code "{}" at offset {} of program'.format(character, offset))
+            stack[-1].append(matcher.group())
+            offset = matcher.end()
+    if len(stack) > 1:
+        raise Exception('unbalanced "(" in program')
+    return stack[0]
+
+
+def compile_groups(items):
+    """
+    :param items: parsed program (see parse_program)
+    :return: the same items where the runs of moving codes are compiled (see compile_program)
+    """
+    return [compile_program(item) if isinstance(item, str) else (compile_groups(item[0]), item[1]) for item in items]
+
+
+def expand_items(items):
+    """
+    :param items: parsed program (see parse_program)
+    :return: the program as a string of moving codes
+    """
+    return ''.join(item if isinstance(item, str) else expand_items(item[0]) * item[1] for item in items)
+
+
+def expand_program(moving_program, max_length=MAX_EXPANDED_LENGTH):
+    """
+    Expand the repetition groups of a program (for the engines working step by step).
+    :param moving_program: a string of moving codes (may hold repetition groups)
+    :param max_length: greatest number of steps of an expanded program
+    :return: the program as a string of moving codes
+    """
+    if '(' not in moving_program:
+        return moving_program
+    items = parse_program(moving_program)
+    length = sum(count_items(items).values())
+    if length > max_length:
+        raise Exception('program of {} steps is too long to be expanded (more than {} steps): only the final status '
+                        'can be computed for such repetition groups'.format(length, max_length))
+    return expand_items(items)
+
+
+def count_items(items):
+    """
+    :param items: parsed program (see parse_program)
+    :return: a dictionary moving code ==> number of occurrences
+    """
+    counts = {moving_code: 0 for moving_code in Mower.MOVING_CODES}
+    for item in items:
+        if isinstance(item, str):
+            for moving_code in Mower.MOVING_CODES:
+                counts[moving_code] += item.count(moving_code)
+        else:
+            for moving_code, count in count_items(item[0]).items():
+                counts[moving_code] += count * item[1]
+    return counts
+
+
+def count_moving_codes(moving_program):
+    """
+    Count the moving codes of a program without expanding its repetition groups.
+    :param moving_program: a string of moving codes (may hold repetition groups)
+    :return: a dictionary moving code ==> number of occurrences
+    """
+    return count_items(parse_program(moving_program) if '(' in moving_program else [moving_program])
+
+
+def program_length(moving_program):
+    """
+    :param moving_program: a string of moving codes (may hold repetition groups)
+    :return: the number of steps of the program
+    """
+    return sum(count_moving_codes(moving_program).values()) if '(' in moving_program else len(moving_program)
+
+
+def advance(coordinate, operand_2_add, run_length, upper_bound):
+    """
+    Saturating addition of operand_2_add (1 or -1) run_length times to a coordinate, clamped to [0, upper_bound].
+    Same result as run_length calls to Mower.move_forward (a move which would leave the grid is ignored).
+    :param coordinate: current coordinate
+    :param operand_2_add: 1 or -1
+    :param run_length: number of forward moves
+    :param upper_bound: grid upper right corner coordinate
+    :return: the coordinate after the forward moves
+    """
+    if operand_2_add > 0:
+        return min(coordinate + run_length, upper_bound) if coordinate < upper_bound else coordinate
+    else:
+        return max(coordinate - run_length, 0) if 0 < coordinate <= upper_bound + 1 else coordinate
@@ -0,0 +1,85 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: single command line entry point.
+  python mowers.py run [--workers N] file_or_directory [...]   apply test files (see runner)
+  python mowers.py serve [--socket PATH] [...]                 json lines simulation service (see simulationservice)
+  python mowers.py viz [--output FILE] [...] test_file          visualize a test file (see mowersviz)
+  Simulation commands never import numpy nor matplotlib: the modules of a command are only imported when the command
+  is run, so that the start-up of the headless commands stays short.
+"""
+
+import argparse
+import sys
+
+import runner
+
+
+def run_command(args):
+    return runner.main(args)
+
+
+def serve_command(args):
+    import asyncio
+    import simulationservice
+    service_parser = argparse.ArgumentParser(prog='mowers.py serve')
+    simulationservice.add_arguments(service_parser)
+    asyncio.run(simulationservice.main(service_parser.parse_args(args.options)))
+    return 0
+
+
+def viz_command(args):
+    from mowersviz import MowersViz, save_animation
+    decimation = {'frame_step': args.frame_step, 'turns_only': args.turns_only, 'max_frames': args.max_frames}
+    if args.output:
+        timings = save_animation(args.scenario_file, args.output, processes=args.processes,
+                                 checkpoint_interval=args.checkpoint_interval, **decimation)
+        print('{} frames written to {} in {:.3f}s'.format(timings['frames'], args.output,
+                                                          timings['render_seconds'] + timings['encode_seconds']))
+    else:
+        MowersViz(args.scenario_file, checkpoint_interval=args.checkpoint_interval, **decimation).anim()
+    return 0
+
+
+def build_parser():
+    """
+    :return: the argparse parser of the command line
+    """
+    parser = argparse.ArgumentParser(description='Robot mowers simulator.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    run_parser = commands.add_parser('run', help='apply test files (headless)')
+    runner.add_arguments(run_parser)
+    run_parser.set_defaults(function=run_command)
+    serve_parser = commands.add_parser('serve', add_help=False,
+                                       help='json lines simulation service (headless, options: serve --help)')
+    # options are parsed by the serve command (simulationservice is not imported by the other commands)
+    serve_parser.set_defaults(function=serve_command, pass_options=True)
+    viz_parser = commands.add_parser('viz', help='visualize a test file (loads numpy and matplotlib)')
+    viz_parser.add_argument('scenario_file', help='test file')
+    viz_parser.add_argument('--output', default=None, help='animated gif (or mp4) to write instead of playing')
+    viz_parser.add_argument('--frame-step', type=int, default=1, help='only display every frame-step step')
+    viz_parser.add_argument('--turns-only', action='store_true', help='only display the steps following a swing')
+    viz_parser.add_argument('--max-frames', type=int, default=None, help='frame budget of the animation')
+    viz_parser.add_argument('--processes', type=int, default=None, help='number of processes rendering frames')
+    viz_parser.add_argument('--checkpoint-interval', type=int, default=None,
+                            help='keep a mower status every checkpoint-interval steps instead of the full history')
+    viz_parser.set_defaults(function=viz_command)
+    return parser
+
+
+def main(argv=None):
+    """
+    :param argv: command line arguments (default: sys.argv[1:])
+    :return: the exit status of the command
+    """
+    parser = build_parser()
+    args, options = parser.parse_known_args(argv)
+    if not getattr(args, 'pass_options', False):
+        args = parser.parse_args(argv)
+    args.options = options
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,7 +2,13 @@
 
 import re
 
-from mower import Mower
+from checkpoints import CheckpointedHistory
+from history import MowerHistory
+from instrumentation import count_blocked_moves
+from lawn import Lawn
+from mower import Mower, expand_program, parse_program, program_length
+from sharedlawn import SharedLawnSimulation
+from statemachine import transition_table_for
 
 UP_RIGHT_CORNER_PATTERN = re.compile('([-+]?\\d+) ([-+]?\\d+)')
 
@@ -71,10 +77,17 @@ def read_mower_status(line, line_number, up_right):
 def read_program(line, line_number):
     """
     Parse a mower "program" line in the test file (should be a sequence of valid mower actions (a, G or D) as a string.
+    Programs may hold repetition groups such as "(AAD)1000000" (they are validated but not expanded).
     :param line: line holding the mower program as a string
     :param line_number: line number in the input file (used in exception to report error)
     :return: the program as a string if no exception occurs
     """
+    if '(' in line or ')' in line:
+        try:
+            parse_program(line)
+        except Exception as e:
+            raise Exception('Error line {}: {}'.format(line_number, e))
+        return line
     for action in line:
         if not Mower.is_valid_moving_code(action):
             raise Exception('Error line {}: programs should be a sequence matching "[AGD]*"'.format(line_number))
@@ -97,6 +110,25 @@ def read_line(f):
     return line
 
 
+def iter_mower_programs(f, up_right, line_number=1):
+    """
+    Generator reading the (mower status, program) couples of lines of a test file one by one.
+    :param f: text file handler (the first line giving the grid upper right corner should have been read)
+    :param up_right: (int, int) tuple ==> grid lawn upper right corner coordinates
+    :param line_number: number of the last line read from the file handler
+    :return: yields tuples (status, program) where status is a tuple as ((int, int), [NESW])
+    """
+    status = None
+    line = read_line(f)
+    while line != '':
+        line_number += 1
+        if line_number % 2 == 0:
+            status = read_mower_status(line, line_number, up_right)
+        else:
+            yield status, read_program(line, line_number)
+        line = read_line(f)
+
+
 class MowersTestPlayer(object):
     """
     Class to read and apply a test file with a format defined in the exercise statements:
@@ -104,62 +136,209 @@ class MowersTestPlayer(object):
     Other lines ==> sequence of couple of lines giving (mower status + a mower program to apply)
     """
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, stats=None):
         self._filename = file_name      # test file name
-        self._mowers = []               # list of tuples (Mover, program) parsed from: the test file
+        self._stats = stats             # optional instrumentation (see instrumentation.PlayerStats)
+        self._lawn = None               # lawn (grid + list of tuples (Mover, program)) parsed from: the test file
         self._final_status = []         # list of final mower status when test has been applied
 
+    @property
+    def lawn(self):
+        return self._lawn
+
     @property
     def mowers(self):
-        return self._mowers
+        return self._lawn.mowers if self._lawn is not None else []
 
     @property
     def all_status(self):
         return self._final_status
 
+    @property
+    def stats(self):
+        return self._stats
+
     def open(self):
         """
         Open and parse input test file (file_name).
         :return: A list of tuples (Mower, program) if no exception occurs
         """
+        start = self._stats.start() if self._stats is not None else None
         with open(self._filename, 'r') as f:
             line = read_line(f)
-            Mower.set_up_right_corner(read_grid_up_right_corner(line, 1))
-            line_number = 1
-            status = None
-            self._mowers = []
-            line = read_line(f)
-            while line != '':
-                line_number += 1
-                if line_number % 2 == 0:
-                    status = read_mower_status(line, line_number, Mower.GRID_UP_RIGHT_CORNER)
-                else:
-                    program = read_program(line, line_number)
-                    self._mowers.append((Mower(status[0], status[1]), program))
-                line = read_line(f)
+            lawn = Lawn(read_grid_up_right_corner(line, 1))
+            for status, program in iter_mower_programs(f, lawn.up_right_corner):
+                lawn.add_mower(status[0], status[1], program)
+            self._lawn = lawn
+            # kept for the code still relying on the class attribute (the mowers themselves use their lawn)
+            Mower.set_up_right_corner(lawn.up_right_corner)
             f.close()
+        if start is not None:
+            self._stats.add_phase_time('parse', start)
 
-    def apply(self, with_history=False):
+    def stream(self, output=None, coverage=None):
+        """
+        Streaming mode: read the mowers of the input test file one by one, apply their program and yield their final
+        status right away. Neither the mowers nor their final status are kept (constant memory whatever the file size).
+        Errors are reported as in the open method, but only when the faulty line is reached.
+        :param output: optional text file handler where final status are written (one by line)
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells visited by the mowers
+        :return: yields the final status of the mowers as strings
+        """
+        with open(self._filename, 'r') as f:
+            line = read_line(f)
+            lawn = Lawn(read_grid_up_right_corner(line, 1))
+            for status, program in iter_mower_programs(f, lawn.up_right_corner):
+                mower = Mower(status[0], status[1], lawn)
+                if coverage is not None:
+                    coverage.visit(status[0][0], status[0][1])
+                mower.move_multiple_steps(program, coverage)
+                final_status = mower.get_str_status()
+                if output is not None:
+                    output.write(final_status + '\n')
+                yield final_status
+
+    def apply_concurrent(self):
+        """
+        Apply the programs of the mowers identified in the test file concurrently: mowers are moved one step at a time
+        in a round-robin way and a forward move into a cell occupied by another mower is blocked.
+        :return: the list of final status of the mowers as strings and a dictionary of statistics (collisions,
+        blocked_moves at the grid edge and rounds)
+        """
+        simulation = SharedLawnSimulation(self._lawn)
+        self._final_status = simulation.run()
+        return self.all_status, simulation.stats
+
+    def _record_mowers(self, records):
+        """
+        :param records: list of (program, number of blocked forward moves) of the mowers
+        :return: None
+        """
+        for moving_program, blocked_moves in records:
+            self._stats.record_mower(moving_program, blocked_moves)
+
+    def apply(self, with_history=False, vectorized=False, coverage=None, cache=None, checkpoint_interval=None):
         """
         Apply the program for each mower identified in the test file.
+        :param with_history: if True, keep all the steps executed by each mower
+        :param vectorized: if True (and with_history is False), move all the mowers together with the numpy based
+                           fleet engine (see fleet.MowersFleet)
+        :param coverage: optional lawn coverage (see lawncoverage) recording the cells visited by the mowers (when
+                         with_history is False)
+        :param cache: optional result cache (see resultcache.ResultCache) used when with_history is False and no
+                      coverage is given. Mowers found in the cache are not simulated (nor recorded by the stats)
+        :param checkpoint_interval: if given (and with_history is True), histories only keep a status every
+                                    checkpoint_interval steps (see checkpoints.CheckpointedHistory)
         :return: the list of final status of the mowers as strings when with_history is False
-        else return the list of all steps executed by mower and all initial status
+        else return the list of all steps executed by mower (as MowerHistory or CheckpointedHistory objects) and all
+        initial status (repetition groups are expanded in histories)
         """
         self._final_status = []
-        if not with_history:
-            for tmover in self._mowers:
-                tmover[0].move_multiple_steps(tmover[1])
+        start = self._stats.start() if self._stats is not None else None
+        # (program, blocked moves) of the mowers to record in the stats once the timed phase is over
+        records = []
+        if not with_history and cache is not None and coverage is None:
+            up_right = self._lawn.up_right_corner
+            for tmover in self.mowers:
+                final_status = cache.get_status(up_right, tmover[0].status, tmover[1])
+                if final_status is not None:
+                    x, y, orientation = final_status.split(' ')
+                    tmover[0].set_status((int(x), int(y)), orientation)
+                else:
+                    initial_status = tmover[0].status
+                    blocked_moves = tmover[0].move_multiple_steps(tmover[1])
+                    final_status = tmover[0].get_str_status()
+                    cache.put_status(up_right, initial_status, tmover[1], final_status)
+                    records.append((tmover[1], blocked_moves))
+                self._final_status.append(final_status)
+            if start is not None:
+                self._stats.add_phase_time('simulate', start)
+                self._record_mowers(records)
+            return self.all_status
+        elif not with_history and vectorized:
+            from fleet import MowersFleet  # numpy is only required by the vectorized engine
+            mowers = [tmover[0] for tmover in self.mowers]
+            if coverage is not None:
+                for mower in mowers:
+                    coverage.visit(mower.position[0], mower.position[1])
+            # programs with repetition groups are not expanded: they are applied mower by mower (cycle detection)
+            fleet_tmovers = [tmover for tmover in self.mowers if '(' not in tmover[1]]
+            fleet = MowersFleet.from_mowers([tmover[0] for tmover in fleet_tmovers], self._lawn.up_right_corner)
+            if start is not None:
+                fleet.track_blocked_moves()
+            fleet.run([tmover[1] for tmover in fleet_tmovers], coverage)
+            fleet.update_mowers([tmover[0] for tmover in fleet_tmovers])
+            fleet_blocked_moves = iter(fleet.blocked_moves or [])
+            for tmover in self.mowers:
+                if '(' in tmover[1]:
+                    records.append((tmover[1], tmover[0].move_multiple_steps(tmover[1], coverage)))
+                elif start is not None:
+                    records.append((tmover[1], next(fleet_blocked_moves)))
+            self._final_status = [mower.get_str_status() for mower in mowers]
+            if start is not None:
+                self._stats.add_phase_time('simulate', start)
+                self._record_mowers(records)
+            return self.all_status
+        elif not with_history:
+            for tmover in self.mowers:
+                if coverage is not None:
+                    coverage.visit(tmover[0].position[0], tmover[0].position[1])
+                blocked_moves = tmover[0].move_multiple_steps(tmover[1], coverage)
                 self._final_status.append(tmover[0].get_str_status())
+                records.append((tmover[1], blocked_moves))
+            if start is not None:
+                self._stats.add_phase_time('simulate', start)
+                self._record_mowers(records)
             return self.all_status
         else:
             initial_status = []
-            for tmover in self._mowers:
+            table = transition_table_for(self._lawn.up_right_corner,
+                                         sum(program_length(tmover[1]) for tmover in self.mowers))
+            for tmover in self.mowers:
                 initial_status.append(tmover[0].status)
-                mower_history = []
-                for step in tmover[1]:
-                    tmover[0].move_one_step(step)
-                    mower_history.append((tmover[0].status, step))
+                moving_program = expand_program(tmover[1])
+                blocked_moves = 0
+                if checkpoint_interval is not None:
+                    mower_history = CheckpointedHistory(self._lawn.up_right_corner, tmover[0].status, moving_program,
+                                                        checkpoint_interval)
+                    tmover[0].set_status(*mower_history.final_status)
+                    blocked_moves = None  # counted once the history phase is over
+                elif table is not None:
+                    # table-driven core: the mower status is written back once the program has been applied
+                    mower_history = MowerHistory(self._lawn.up_right_corner)
+                    state = table.encode(tmover[0].position, tmover[0].orientation)
+                    if start is None:
+                        for state, step in zip(table.trace(state, moving_program), moving_program):
+                            mower_history.append_state(state, step)
+                    else:
+                        previous_state = state
+                        for state, step in zip(table.trace(state, moving_program), moving_program):
+                            mower_history.append_state(state, step)
+                            # a forward move which does not change the state is blocked at the grid edge
+                            if state == previous_state and step == 'A':
+                                blocked_moves += 1
+                            previous_state = state
+                    tmover[0].set_status(*table.decode(state))
+                elif start is None:
+                    mower_history = MowerHistory(self._lawn.up_right_corner)
+                    for step in moving_program:
+                        tmover[0].move_one_step(step)
+                        mower_history.append(tmover[0].status, step)
+                else:
+                    mower_history = MowerHistory(self._lawn.up_right_corner)
+                    for step in moving_program:
+                        position = tmover[0].position
+                        tmover[0].move_one_step(step)
+                        if step == 'A' and tmover[0].position == position:
+                            blocked_moves += 1
+                        mower_history.append(tmover[0].status, step)
                 self._final_status.append(mower_history)
+                records.append((tmover[1], blocked_moves))
+            if start is not None:
+                self._stats.add_phase_time('history', start)
+                # checkpointed histories do not keep the steps: their blocked moves are counted by a compiled run
+                self._record_mowers([(program, count_blocked_moves(self._lawn, status, program) if blocked is None
+                                      else blocked) for (program, blocked), status in zip(records, initial_status)])
             return self.all_status, initial_status
 
 
@@ -1,18 +1,33 @@
 # -*- coding:utf-8 -*-
 
+import os
+import re
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 from matplotlib import pyplot as plt
 import numpy as np
-from matplotlib import cm
-from matplotlib.colors import ListedColormap
+from mower import expand_program
 from mowerstestplayer import MowersTestPlayer
-from mower import Mower
-from matplotlib.animation import FuncAnimation
 from matplotlib.patches import FancyArrow
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 TITLE_LINE1 = '\nTest file: {}\n'
 TITLE_LINE2 = '\nMower {}\n\nStatus: position=({} ,{}), orientation={}\n Step: {}'
 TITLE_LINE3 = '\n Next action: {}'
 
+DEFAULT_DPI = 80
+FRAME_INTERVAL = 2000  # delay between frames in milliseconds
+
+RENDER_CHUNK_FRAMES = 16  # number of frames rendered by a worker task (see save_animation)
+
+SWING_PATTERN = re.compile('[GD]')
+
+ARROW_LENGTH = 0.37
+ARROW_SHIFTS = {'N': (0, ARROW_LENGTH), 'E': (ARROW_LENGTH, 0), 'S': (0, -ARROW_LENGTH), 'W': (-ARROW_LENGTH, 0)}
+
 
 class MowersViz(object):
     """
@@ -21,26 +36,75 @@ class MowersViz(object):
     Inspired from this article: https://eli.thegreenplace.net/2016/drawing-animated-gifs-with-matplotlib/
     """
 
-    LARGE_GREENS_CMAP = cm.get_cmap('Greens', 512)
-    # Create a new green colormap from the 'Greens' matplotlib colormap
-    FULL_GREEN_CMAP = ListedColormap(LARGE_GREENS_CMAP(np.linspace(0.4, 0.6, 256)))
+    _full_green_cmap = None  # created on first use (see full_green_cmap)
 
-    def __init__(self, scenario_file):
+    @classmethod
+    def full_green_cmap(cls):
+        """
+        Create (once) a new green colormap from the 'Greens' matplotlib colormap.
+        :return: a matplotlib colormap
+        """
+        if cls._full_green_cmap is None:
+            from matplotlib.colors import ListedColormap
+            try:
+                from matplotlib import colormaps
+                large_greens_cmap = colormaps['Greens'].resampled(512)
+            except (ImportError, AttributeError):  # matplotlib < 3.6
+                from matplotlib import cm
+                large_greens_cmap = cm.get_cmap('Greens', 512)
+            cls._full_green_cmap = ListedColormap(large_greens_cmap(np.linspace(0.4, 0.6, 256)))
+        return cls._full_green_cmap
+
+    def __init__(self, scenario_file, frame_step=1, turns_only=False, max_frames=None, checkpoint_interval=None):
         """
         Constructor. Initialize the test visualizer.
         :param scenario_file: path of test file
+        :param frame_step: decimation: only display every frame_step step of each mower program
+        :param turns_only: decimation: only display the steps following a swing ('G' or 'D')
+        :param max_frames: decimation: frame budget of the whole animation
+        :param checkpoint_interval: if given, only keep a status every checkpoint_interval steps of each mower
+                                    (displayed steps are replayed from the nearest checkpoint)
         """
         self._scenario_file = scenario_file
         # Create the test player and apply test
         mplayer = MowersTestPlayer(self._scenario_file)
         mplayer.open()
-        self._scenario, self._initmowers = mplayer.apply(with_history=True)
+        self._up_right = mplayer.lawn.up_right_corner
+        programs = [expand_program(tmover[1]) for tmover in mplayer.mowers]
+        self._mower_starts, self._frame_steps = build_frame_index(programs, frame_step, turns_only, max_frames)
+        self._scenario, self._initmowers = mplayer.apply(with_history=True,
+                                                         checkpoint_interval=checkpoint_interval)
+        self._decimation = {'frame_step': frame_step, 'turns_only': turns_only, 'max_frames': max_frames}
+        self._checkpoint_interval = checkpoint_interval
         # other instance variables initialization
         self._fig, self._ax, self._img_grid, self._grid_lawn = self.create_graphic_ctx()
-        self._circle, self._arrow = None, None
+        self._title = self._fig.suptitle(TITLE_LINE1.format(self._scenario_file), fontsize='xx-large')
+        self._circle, self._arrow = self.create_mower_artists()
+        self._status_text = None  # only used when blitting
         self._mower_index = 0
+        self._step = 0
         self.draw_mower(0, 0)
 
+    @property
+    def figure(self):
+        return self._fig
+
+    @classmethod
+    def count_scenario_frames(cls, scenario_file, frame_step=1, turns_only=False, max_frames=None):
+        """
+        Count the frames of the animation of a test scenario without building any figure (nor applying the test).
+        :param scenario_file: path of test file
+        :param frame_step: decimation (see constructor)
+        :param turns_only: decimation (see constructor)
+        :param max_frames: decimation (see constructor)
+        :return: the number of frames
+        """
+        mplayer = MowersTestPlayer(scenario_file)
+        mplayer.open()
+        mower_starts, frame_steps = build_frame_index([expand_program(tmover[1]) for tmover in mplayer.mowers],
+                                                      frame_step, turns_only, max_frames)
+        return mower_starts[-1] if frame_steps is None else len(frame_steps)
+
     def create_graphic_ctx(self):
         """
         Create a graphic context for the visualization.
@@ -48,10 +112,10 @@ class MowersViz(object):
         """
         fig, ax = plt.subplots(figsize=(7, 7))
         fig.set_tight_layout(True)
-        plt.xlim(-0.5, Mower.GRID_UP_RIGHT_CORNER[0] + 0.5)
-        plt.ylim(-0.5, Mower.GRID_UP_RIGHT_CORNER[0] + 0.5)
-        plt.xticks(np.arange(0, Mower.GRID_UP_RIGHT_CORNER[0] + 1, 1.0))
-        plt.yticks(np.arange(0, Mower.GRID_UP_RIGHT_CORNER[1] + 1, 1.0))
+        plt.xlim(-0.5, self._up_right[0] + 0.5)
+        plt.ylim(-0.5, self._up_right[0] + 0.5)
+        plt.xticks(np.arange(0, self._up_right[0] + 1, 1.0))
+        plt.yticks(np.arange(0, self._up_right[1] + 1, 1.0))
         for tick in ax.yaxis.get_major_ticks():
             tick.label1.set_fontsize(14)
             for tick in ax.xaxis.get_major_ticks():
@@ -59,23 +123,29 @@ class MowersViz(object):
                 tick.label1.set_fontweight('bold')
             tick.label1.set_fontweight('bold')
         fig.suptitle(TITLE_LINE1.format(self._scenario_file), fontsize='xx-large')
-        grid_lawn = np.ones((Mower.GRID_UP_RIGHT_CORNER[1] + 1, Mower.GRID_UP_RIGHT_CORNER[0] + 1))
+        grid_lawn = np.ones((self._up_right[1] + 1, self._up_right[0] + 1))
         grid_lawn[0, 0] = 0
-        img_grid = plt.imshow(grid_lawn, cmap=MowersViz.FULL_GREEN_CMAP)
+        img_grid = plt.imshow(grid_lawn, cmap=MowersViz.full_green_cmap())
         # plt.show()
         return fig, ax, img_grid, grid_lawn
 
+    def create_mower_artists(self):
+        """
+        Create the artists representing a mower (a filled circle with an arrow for the mower orientation). They are
+        created once and moved on each frame.
+        :return: a circle and an arrow
+        """
+        circle = plt.Circle((0, 0), 0.4, color='blue', alpha=0.3)
+        self._ax.add_patch(circle)
+        arrow = FancyArrow(0, 0, 0, ARROW_LENGTH, color='w', width=0.03, joinstyle='miter')
+        self._ax.add_patch(arrow)
+        return circle, arrow
+
     def clear_graphic_ctx(self):
         """
         Clear the graphic context.
         :return: None
         """
-        if self._circle is not None:
-            self._circle.remove()
-            self._circle = None
-        if self._arrow is not None:
-            self._arrow.remove()
-            self._arrow = None
         self._grid_lawn[:, :] = 1
         self._img_grid.set_data(self._grid_lawn)
 
@@ -86,7 +156,7 @@ class MowersViz(object):
         :param mower_index: mower rank in the test file (0 is first)
         :param step_number: program step to represent (0 ==> initial status. Other steps are from 1 to
                             the length of the program associated to the mower: [1, len(program])
-        :return: None
+        :return: the list of artists updated
         """
         if step_number == 0:
             circle_x = self._initmowers[mower_index][0][0]
@@ -99,73 +169,304 @@ class MowersViz(object):
             orientation = self._scenario[mower_index][step_number - 1][0][1]
         self._grid_lawn[circle_y, circle_x] = 0
         self._img_grid.set_data(self._grid_lawn)
-        self._circle = plt.Circle((circle_x, circle_y), 0.4, color='blue', alpha=0.3)
-        self._ax.add_patch(self._circle)
-        if orientation == 'N':
-            self._arrow = FancyArrow(circle_x, circle_y, 0, 0.37, color='w', width=0.03, joinstyle='miter')
-        elif orientation == 'E':
-            self._arrow = FancyArrow(circle_x, circle_y, 0.37, 0, color='w', width=0.03, joinstyle='miter')
-        elif orientation == 'S':
-            self._arrow = FancyArrow(circle_x, circle_y, 0, -0.37, color='w', width=0.03, joinstyle='miter')
-        elif orientation == 'W':
-            self._arrow = FancyArrow(circle_x, circle_y, -0.37, 0, color='w', width=0.03, joinstyle='miter')
-        self._ax.add_patch(self._arrow)
-        title = TITLE_LINE1.format(self._scenario_file)
-        title += TITLE_LINE2.format(self._mower_index + 1, circle_x, circle_y, orientation, step_number)
-        if step_number < len(self._scenario[self._mower_index]):
-            title += TITLE_LINE3.format(self._scenario[self._mower_index][step_number][1])
-        self._fig.suptitle(title, fontsize='xx-large')
+        self._circle.center = (circle_x, circle_y)
+        arrow_dx, arrow_dy = ARROW_SHIFTS[orientation]
+        self._arrow.set_data(x=circle_x, y=circle_y, dx=arrow_dx, dy=arrow_dy)
+        title = TITLE_LINE2.format(mower_index + 1, circle_x, circle_y, orientation, step_number)
+        if step_number < len(self._scenario[mower_index]):
+            title += TITLE_LINE3.format(self._scenario[mower_index][step_number][1])
+        if self._status_text is not None:
+            # blitting mode: the status is drawn inside the axes (the figure title is not redrawn)
+            self._status_text.set_text(title.strip())
+            return [self._img_grid, self._circle, self._arrow, self._status_text]
+        self._title.set_text(TITLE_LINE1.format(self._scenario_file) + title)
+        return [self._img_grid, self._circle, self._arrow, self._title]
 
     def get_mower_index_and_step(self, refresh_step):
         """
-        Retrieve the mower index and the step in the mower program for the current refresh step of the animation.
+        Retrieve the mower index and the step in the mower program for the current refresh step of the animation
+        (direct lookup in the frame index).
         :param refresh_step: step in the animation
         :return: the mower index in the scenario and the step in the mower program
         """
-        idx = 0
-        steps = 0
-        for mower in self._scenario:
-            if refresh_step < steps + len(mower) + 1:
-                return idx, refresh_step - steps  # - len(mower) - 1
-            else:
-                steps += len(mower) + 1
-                idx += 1
+        if self._frame_steps is not None:
+            refresh_step = int(self._frame_steps[refresh_step])
+        idx = bisect_right(self._mower_starts, refresh_step) - 1
+        return idx, refresh_step - self._mower_starts[idx]
+
+    def frames_count(self):
+        """
+        :return: the number of frames of the animation of the scenario
+        """
+        return self._mower_starts[-1] if self._frame_steps is None else len(self._frame_steps)
+
+    def mark_mowed(self, mower_index, start, stop):
+        """
+        Mark as mowed the cells of the steps [start, stop[ of a mower (used when frames are skipped).
+        :param mower_index: mower rank in the test file (0 is first)
+        :param start: first step (0 ==> initial status)
+        :param stop: step after the last step
+        :return: None
+        """
+        if start == 0 and stop > 0:
+            position = self._initmowers[mower_index][0]
+            self._grid_lawn[position[1], position[0]] = 0
+            start = 1
+        if start < stop:
+            xs, ys = self._scenario[mower_index].coordinates(start - 1, stop - 1)
+            self._grid_lawn[ys, xs] = 0
 
     def update(self, i):
         """
         Refresh matplotlib objects to display the next step of the scenario.
         :param i: step considered
-        :return: None
+        :return: the list of artists updated
         """
-        if self._circle is not None:
-            self._circle.remove()
-            self._circle = None
-        if self._arrow is not None:
-            self._arrow.remove()
-            self._arrow = None
         mower_index, step = self.get_mower_index_and_step(i)
-        if mower_index != self._mower_index:
+        if mower_index != self._mower_index or step <= self._step:
             self.clear_graphic_ctx()
             self._mower_index = mower_index
-        self.draw_mower(self._mower_index, step)
+            self._step = -1
+        self.mark_mowed(mower_index, self._step + 1, step)
+        self._step = step
+        return self.draw_mower(self._mower_index, step)
+
+    def seek(self, i):
+        """
+        Display any step of the scenario (the cells already mowed by the current mower are restored).
+        :param i: step considered
+        :return: the list of artists updated
+        """
+        self._mower_index = -1
+        return self.update(i)
+
+    def render_frames(self, start, stop, dpi=DEFAULT_DPI):
+        """
+        Render frames offscreen (Agg canvas) straight into pixel arrays.
+        :param start: first frame to render
+        :param stop: frame after the last frame to render
+        :param dpi: resolution of the frames
+        :return: a list of numpy arrays of shape (height, width, 3)
+        """
+        canvas = FigureCanvasAgg(self._fig)
+        self._fig.set_dpi(dpi)
+        # the tight layout of the figure only settles after a first draw: without this draw, the first frame of a range
+        # would not be the same as the one rendered in a sequential playback
+        canvas.draw()
+        frames = []
+        for i in range(start, stop):
+            if i == start:
+                self.seek(i)
+            else:
+                self.update(i)
+            canvas.draw()
+            frames.append(np.asarray(canvas.buffer_rgba())[:, :, :3].copy())
+        return frames
 
-    def anim(self, anim_gif=None):
+    def anim(self, anim_gif=None, writer=None, processes=None):
         """
-        Animate the test scenario or generate an animated gif of the test scenario.
+        Animate the test scenario or generate an animated gif (or mp4) of the test scenario.
         :param anim_gif: file to generate (optional)
-        :return: None
+        :param writer: matplotlib animation writer to use (for instance 'imagemagick'). By default, frames are rendered
+                       offscreen in a process pool and encoded in-process (see save_animation)
+        :param processes: number of processes rendering the frames when writer is None
+        :return: the render timings (see save_animation) when a file is generated with the default writer
         """
-        scenario_steps = 0
-        for mower in self._scenario:
-            scenario_steps += len(mower) + 1
-        anim = FuncAnimation(self._fig, self.update,
-                             frames=np.arange(0, scenario_steps),
-                             interval=2000)
+        if anim_gif and writer is None:
+            return save_animation(self._scenario_file, anim_gif, processes=processes,
+                                  checkpoint_interval=self._checkpoint_interval, **self._decimation)
+        from matplotlib.animation import FuncAnimation  # only loaded for playback and matplotlib writers
+        frames = np.arange(0, self.frames_count())
         if anim_gif:
-            anim.save(anim_gif, dpi=80, writer='imagemagick')
+            # saved frames keep the status in the figure title (same frames as save_animation)
+            anim = FuncAnimation(self._fig, self.update, frames=frames, interval=FRAME_INTERVAL)
+            anim.save(anim_gif, dpi=DEFAULT_DPI, writer=writer)
         else:
+            # blitting is only used by interactive playback
+            anim = FuncAnimation(self._fig, self.update, frames=frames, interval=FRAME_INTERVAL, blit=True,
+                                 init_func=self.init_blit)
             plt.show()
 
+    def init_blit(self):
+        """
+        Initialize the figure for blitting: the status is drawn inside the axes as an animated text (blitting only
+        redraws the axes area) and the figure title only shows the test file.
+        :return: the list of animated artists
+        """
+        if self._status_text is None:
+            self._status_text = self._ax.text(0.02, 0.98, '', transform=self._ax.transAxes, va='top',
+                                              fontsize='large', animated=True)
+            self._title.set_text(TITLE_LINE1.format(self._scenario_file))
+        return self.draw_mower(self._mower_index, 0)
+
+
+def init_render_worker():
+    """
+    Initializer of the rendering worker processes: frames are rendered offscreen.
+    :return: None
+    """
+    plt.switch_backend('Agg')
+
+
+# scenario visualization of a rendering worker process (kept from one task to the next: the scenario is parsed and
+# simulated once by worker)
+_worker_viz = {'key': None, 'viz': None}
+
+
+def render_frame_range(scenario_file, start, stop, dpi=DEFAULT_DPI, decimation=None, checkpoint_interval=None):
+    """
+    Render a range of frames of a test scenario (executed by the workers of the process pool).
+    :param scenario_file: path of test file
+    :param start: first frame to render
+    :param stop: frame after the last frame to render
+    :param dpi: resolution of the frames
+    :param decimation: decimation parameters of the animation (see MowersViz constructor)
+    :param checkpoint_interval: checkpoint interval of the mowers histories (see MowersViz constructor)
+    :return: a list of numpy arrays of shape (height, width, 3)
+    """
+    key = (scenario_file, tuple(sorted((decimation or {}).items())), checkpoint_interval)
+    if _worker_viz['key'] != key:
+        if _worker_viz['viz'] is not None:
+            plt.close(_worker_viz['viz'].figure)
+        _worker_viz['viz'] = MowersViz(scenario_file, checkpoint_interval=checkpoint_interval, **(decimation or {}))
+        _worker_viz['key'] = key
+    return _worker_viz['viz'].render_frames(start, stop, dpi)
+
+
+def write_frames(file_name, frames, interval=FRAME_INTERVAL):
+    """
+    Encode frames in-process: animated gif with pillow, mp4 with imageio (if installed).
+    :param file_name: file to generate (.gif or .mp4)
+    :param frames: iterable of numpy arrays of shape (height, width, 3) (frames are encoded as they come)
+    :param interval: delay between frames in milliseconds
+    :return: None
+    """
+    frames = iter(frames)
+    if file_name.lower().endswith('.mp4'):
+        try:
+            import imageio
+        except ImportError:
+            raise Exception('imageio (with its ffmpeg plugin) is required to generate mp4 files')
+        with imageio.get_writer(file_name, fps=1000.0 / interval) as writer:
+            for frame in frames:
+                writer.append_data(frame)
+    else:
+        from PIL import Image
+        first_frame = next(frames, None)
+        if first_frame is None:
+            raise Exception('no frame to write')
+        Image.fromarray(first_frame).save(file_name, save_all=True, duration=interval, loop=0,
+                                          append_images=(Image.fromarray(frame) for frame in frames))
+
+
+def save_animation(scenario_file, file_name, processes=None, dpi=DEFAULT_DPI, interval=FRAME_INTERVAL, frame_step=1,
+                   turns_only=False, max_frames=None, checkpoint_interval=None):
+    """
+    Generate the animation of a test scenario: ranges of RENDER_CHUNK_FRAMES frames are rendered offscreen in a process
+    pool and the frames are streamed in order to the encoder (only the ranges being rendered are kept in memory).
+    :param scenario_file: path of test file
+    :param file_name: file to generate (.gif or .mp4)
+    :param processes: number of worker processes (None ==> number of CPUs, 0 ==> frames are rendered in the current
+                      process)
+    :param dpi: resolution of the frames
+    :param interval: delay between frames in milliseconds
+    :param frame_step: decimation (see MowersViz constructor)
+    :param turns_only: decimation (see MowersViz constructor)
+    :param max_frames: decimation (see MowersViz constructor)
+    :param checkpoint_interval: checkpoint interval of the mowers histories (see MowersViz constructor)
+    :return: a dictionary with the number of frames and the render and encode times in seconds (render time is the
+    time spent waiting for the frames)
+    """
+    start_time = time.perf_counter()
+    decimation = {'frame_step': frame_step, 'turns_only': turns_only, 'max_frames': max_frames}
+    frames_count = MowersViz.count_scenario_frames(scenario_file, **decimation)
+    ranges = [(start, min(start + RENDER_CHUNK_FRAMES, frames_count))
+              for start in range(0, frames_count, RENDER_CHUNK_FRAMES)]
+    render_seconds = [time.perf_counter() - start_time]
+
+    def render_in_process():
+        viz = MowersViz(scenario_file, checkpoint_interval=checkpoint_interval, **decimation)
+        try:
+            for start, stop in ranges:
+                yield viz.render_frames(start, stop, dpi)
+        finally:
+            plt.close(viz.figure)
+
+    def render_in_pool():
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker) as executor:
+            pending_ranges = iter(ranges)
+            futures = deque()
+            # ranges are rendered ahead of the encoder, at most 2 by worker
+            for start, stop in pending_ranges:
+                futures.append(executor.submit(render_frame_range, scenario_file, start, stop, dpi, decimation,
+                                               checkpoint_interval))
+                if len(futures) >= 2 * workers:
+                    break
+            while futures:
+                frames = futures.popleft().result()
+                for start, stop in pending_ranges:
+                    futures.append(executor.submit(render_frame_range, scenario_file, start, stop, dpi, decimation,
+                                                   checkpoint_interval))
+                    break
+                yield frames
+
+    def timed_frames(frame_ranges):
+        while True:
+            render_start = time.perf_counter()
+            frames = next(frame_ranges, None)
+            render_seconds[0] += time.perf_counter() - render_start
+            if frames is None:
+                return
+            for frame in frames:
+                yield frame
+    write_frames(file_name, timed_frames(render_in_process() if processes == 0 else render_in_pool()), interval)
+    return {'frames': frames_count, 'render_seconds': render_seconds[0],
+            'encode_seconds': time.perf_counter() - start_time - render_seconds[0]}
+
+
+def build_frame_index(programs, frame_step=1, turns_only=False, max_frames=None):
+    """
+    Build the frame index of the animation of a test scenario. Steps of the scenario are numbered globally: the steps of
+    mower i (from 0 ==> initial status to len(program)) start at mower_starts[i].
+    Frames can be decimated (the first and the last step of each mower are always displayed):
+    - frame_step > 1 ==> only every frame_step step of each mower program is displayed
+    - turns_only ==> only the steps following a swing ('G' or 'D') are displayed
+    - max_frames ==> the other frames are evenly sampled so that the animation has at most max_frames frames (or only
+      the first and last steps of the mowers when max_frames is lower than twice the number of mowers).
+    :param programs: list of the mowers programs
+    :param frame_step: decimation: only display every frame_step step of each mower program
+    :param turns_only: decimation: only display the steps following a swing
+    :param max_frames: decimation: frame budget of the whole animation
+    :return: a tuple (mower_starts, frame_steps) where mower_starts is the list of the first global step of each mower
+    (plus the total number of steps) and frame_steps is a numpy array giving the global step of each frame (None when
+    no decimation is applied ==> frame i displays global step i)
+    """
+    mower_starts = [0]
+    for program in programs:
+        mower_starts.append(mower_starts[-1] + len(program) + 1)
+    if frame_step <= 1 and not turns_only and max_frames is None:
+        return mower_starts, None
+    frame_steps = []
+    for mower_start, program in zip(mower_starts, programs):
+        if turns_only:
+            steps = [0] + [match.end() for match in SWING_PATTERN.finditer(program)]
+        else:
+            steps = list(range(0, len(program) + 1, max(1, frame_step)))
+        if steps[-1] != len(program):
+            steps.append(len(program))
+        frame_steps.extend(mower_start + step for step in steps)
+    frame_steps = np.array(frame_steps, dtype=np.int64)
+    if max_frames is not None and len(frame_steps) > max_frames:
+        bounds = np.unique(np.array(mower_starts[:-1] + [mower_start - 1 for mower_start in mower_starts[1:]],
+                                    dtype=np.int64))
+        others = np.setdiff1d(frame_steps, bounds)
+        budget = min(len(others), max(0, max_frames - len(bounds)))
+        # evenly spaced between the kept bounds
+        sampled = others[np.unique(np.rint(np.linspace(-1, len(others), budget + 2)[1:-1]).astype(np.int64))]
+        frame_steps = np.union1d(bounds, sampled)
+    return mower_starts, frame_steps
+
 
 if __name__ == '__main__':
     mViz = MowersViz('testmowers1.data')
@@ -0,0 +1,163 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: content-addressed cache of simulation results.
+  Final status are memoized by a hash of (grid upper right corner, initial status, program) in an in-memory LRU with a
+  size bound and optionally in an on-disk store (dbm) surviving restarts. The final status of a whole test file are
+  also memoized by a hash of the file content, so that an unchanged file is neither parsed nor applied.
+"""
+
+import dbm
+import hashlib
+import os
+from collections import OrderedDict
+
+from mowerstestplayer import MowersTestPlayer
+
+DEFAULT_MAX_ENTRIES = 1 << 16
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def mower_key(up_right_corner, status, moving_program):
+    """
+    :param up_right_corner: upper right corner of the lawn grid
+    :param status: initial status of the mower (tuple (position, orientation))
+    :param moving_program: program applied to the mower
+    :return: the cache key of the final status of the mower
+    """
+    content = '{} {}|{} {} {}|{}'.format(up_right_corner[0], up_right_corner[1], status[0][0], status[0][1], status[1],
+                                         moving_program)
+    return 'm' + hashlib.sha256(content.encode('ascii', 'replace')).hexdigest()
+
+
+def file_key(file_name):
+    """
+    :param file_name: path of a test file
+    :return: the cache key of the final status of the mowers of the test file (hash of the file content)
+    """
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        chunk = f.read(HASH_CHUNK_SIZE)
+        while chunk:
+            digest.update(chunk)
+            chunk = f.read(HASH_CHUNK_SIZE)
+    return 'f' + digest.hexdigest()
+
+
+class ResultCache(object):
+    """
+    Memoization of final status: in-memory LRU + optional on-disk store.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=None):
+        """
+        Constructor.
+        :param max_entries: size bound of the in-memory LRU
+        :param directory: directory of the on-disk store (optional)
+        """
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._store = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._store = dbm.open(os.path.join(directory, 'results'), 'c')
+        self._hits, self._misses, self._disk_hits = 0, 0, 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the on-disk store.
+        :return: None
+        """
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    @property
+    def stats(self):
+        """
+        :return: a dictionary with the hits (in memory or on disk), disk hits, misses and in-memory entries counts
+        """
+        return {'hits': self._hits, 'disk_hits': self._disk_hits, 'misses': self._misses,
+                'entries': len(self._entries)}
+
+    def get(self, key):
+        """
+        :param key: cache key (see mower_key and file_key)
+        :return: the cached value (string) or None
+        """
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+        if self._store is not None:
+            stored = self._store.get(key)
+            if stored is not None:
+                value = stored.decode('ascii')
+                self._remember(key, value)
+                self._hits += 1
+                self._disk_hits += 1
+                return value
+        self._misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        :param key: cache key (see mower_key and file_key)
+        :param value: value to cache (string)
+        :return: None
+        """
+        self._remember(key, value)
+        if self._store is not None:
+            self._store[key] = value.encode('ascii')
+
+    def get_status(self, up_right_corner, status, moving_program):
+        """
+        :param up_right_corner: upper right corner of the lawn grid
+        :param status: initial status of the mower (tuple (position, orientation))
+        :param moving_program: program applied to the mower
+        :return: the cached final status of the mower as a string or None
+        """
+        return self.get(mower_key(up_right_corner, status, moving_program))
+
+    def put_status(self, up_right_corner, status, moving_program, final_status):
+        """
+        :param up_right_corner: upper right corner of the lawn grid
+        :param status: initial status of the mower (tuple (position, orientation))
+        :param moving_program: program applied to the mower
+        :param final_status: final status of the mower as a string
+        :return: None
+        """
+        self.put(mower_key(up_right_corner, status, moving_program), final_status)
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+def apply_cached(file_name, cache):
+    """
+    Apply a test file using a result cache: if the file content is unchanged, its final status are returned without
+    parsing it, else each mower final status is looked up in the cache before being simulated.
+    :param file_name: path of a test file
+    :param cache: a ResultCache object
+    :return: the list of final status of the mowers as strings
+    """
+    key = file_key(file_name)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached.split('\n') if cached else []
+    player = MowersTestPlayer(file_name)
+    player.open()
+    all_status = player.apply(cache=cache)
+    cache.put(key, '\n'.join(all_status))
+    return all_status
@@ -0,0 +1,198 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: parallel runner of many test files.
+  Test files (or directories of test files) are applied in a process pool. The final status (or the error) of each
+  file are reported as soon as the file is done and checked against an optional expected output file (same path with
+  the EXPECTED_SUFFIX suffix, one final status by line). A throughput summary is printed at the end.
+  Usage: python runner.py [--workers N] file_or_directory [file_or_directory ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from mower import program_length
+from mowerstestplayer import MowersTestPlayer
+
+SCENARIO_SUFFIX = '.data'
+EXPECTED_SUFFIX = '.expected'
+
+
+def find_scenario_files(paths, suffix=SCENARIO_SUFFIX):
+    """
+    :param paths: list of test files and directories (directories are walked recursively)
+    :param suffix: suffix of the test files searched in directories
+    :return: the list of test files (sorted by directory)
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                files.extend(os.path.join(dir_path, name) for name in sorted(file_names) if name.endswith(suffix))
+        else:
+            files.append(path)
+    return files
+
+
+def read_expected(file_name, suffix=EXPECTED_SUFFIX):
+    """
+    :param file_name: path of a test file
+    :param suffix: suffix of the expected output file
+    :return: the expected final status as a list of strings or None if there is no expected output file
+    """
+    expected_file = os.path.splitext(file_name)[0] + suffix
+    if not os.path.isfile(expected_file):
+        return None
+    with open(expected_file) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_file(file_name, expected_suffix=EXPECTED_SUFFIX):
+    """
+    Apply a test file (executed by the workers of the pool).
+    :param file_name: path of a test file
+    :param expected_suffix: suffix of the expected output file
+    :return: a dictionary with the file name, the final status or the error, the numbers of mowers and steps, the
+    expected final status (or None) and the check result ('PASS', 'FAIL', 'ERROR' or 'DONE' when nothing is expected)
+    """
+    result = {'file': file_name, 'status': None, 'error': None, 'mowers': 0, 'steps': 0, 'expected': None}
+    try:
+        player = MowersTestPlayer(file_name)
+        player.open()
+        result['mowers'] = len(player.mowers)
+        result['steps'] = sum(program_length(tmover[1]) for tmover in player.mowers)
+        result['status'] = player.apply()
+        result['expected'] = read_expected(file_name, expected_suffix)
+    except Exception as e:
+        result['error'] = str(e)
+    if result['error'] is not None:
+        result['check'] = 'ERROR'
+    elif result['expected'] is None:
+        result['check'] = 'DONE'
+    else:
+        result['check'] = 'PASS' if result['expected'] == result['status'] else 'FAIL'
+    return result
+
+
+def run_files(files, workers=None, expected_suffix=EXPECTED_SUFFIX):
+    """
+    Generator applying test files in a process pool.
+    :param files: list of test files
+    :param workers: number of worker processes (default: number of CPUs, 0: no pool)
+    :param expected_suffix: suffix of the expected output files
+    :return: yields the result of each file (see run_file) as soon as the file is done
+    """
+    if workers == 0:
+        for file_name in files:
+            yield run_file(file_name, expected_suffix)
+        return
+    # the process pool modules are not imported by single file runs (start-up time)
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_file, file_name, expected_suffix) for file_name in files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def format_result(result):
+    """
+    :param result: result of a test file (see run_file)
+    :return: the result as a string
+    """
+    if result['check'] == 'ERROR':
+        return 'ERROR {}: {}'.format(result['file'], result['error'])
+    line = '{} {}: {}'.format(result['check'], result['file'], ', '.join(result['status']))
+    if result['check'] == 'FAIL':
+        line += ' (expected: {})'.format(', '.join(result['expected']))
+    return line
+
+
+class RunSummary(object):
+    """
+    Counters and throughput of a run.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._elapsed = None
+        self._files, self._mowers, self._steps = 0, 0, 0
+        self._checks = {'PASS': 0, 'FAIL': 0, 'ERROR': 0, 'DONE': 0}
+
+    def add(self, result):
+        """
+        :param result: result of a test file (see run_file)
+        :return: None
+        """
+        self._files += 1
+        self._mowers += result['mowers']
+        self._steps += result['steps']
+        self._checks[result['check']] += 1
+
+    def stop(self):
+        self._elapsed = time.perf_counter() - self._start
+
+    @property
+    def elapsed(self):
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._start
+
+    @property
+    def checks(self):
+        return self._checks
+
+    @property
+    def succeeded(self):
+        return self._checks['FAIL'] == 0 and self._checks['ERROR'] == 0
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        return {'files': self._files, 'mowers': self._mowers, 'steps': self._steps, 'seconds': elapsed,
+                'files_per_second': self._files / elapsed if elapsed > 0 else 0.0,
+                'mowers_per_second': self._mowers / elapsed if elapsed > 0 else 0.0,
+                'steps_per_second': self._steps / elapsed if elapsed > 0 else 0.0,
+                'checks': dict(self._checks)}
+
+    def __str__(self):
+        summary = self.to_dict()
+        return ('{files} files ({checks[PASS]} passed, {checks[FAIL]} failed, {checks[ERROR]} errors, '
+                '{checks[DONE]} unchecked) in {seconds:.3f}s: {files_per_second:.1f} files/s, '
+                '{mowers_per_second:.1f} mowers/s, {steps_per_second:.1f} steps/s').format(**summary)
+
+
+def add_arguments(parser):
+    """
+    :param parser: argparse parser of the runner command line
+    :return: None
+    """
+    parser.add_argument('paths', nargs='+', help='test files or directories of test files')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (0: no pool)')
+    parser.add_argument('--suffix', default=SCENARIO_SUFFIX, help='suffix of the test files searched in directories')
+    parser.add_argument('--expected-suffix', default=EXPECTED_SUFFIX, help='suffix of the expected output files')
+    parser.add_argument('--quiet', action='store_true', help='only print failures, errors and the summary')
+
+
+def main(args):
+    """
+    Run the test files given on the command line and print the results and the summary.
+    :param args: parsed command line (see add_arguments)
+    :return: the exit status (0 if no file failed)
+    """
+    files = find_scenario_files(args.paths, args.suffix)
+    # no process pool for a single file (the pool start-up would dominate)
+    workers = 0 if args.workers is None and len(files) == 1 else args.workers
+    run_summary = RunSummary()
+    for file_result in run_files(files, workers, args.expected_suffix):
+        run_summary.add(file_result)
+        if not args.quiet or file_result['check'] in ('FAIL', 'ERROR'):
+            print(format_result(file_result), flush=True)
+    run_summary.stop()
+    print(run_summary)
+    return 0 if run_summary.succeeded else 1
+
+
+if __name__ == '__main__':
+    runner_parser = argparse.ArgumentParser(description='Apply many mowers test files in parallel.')
+    add_arguments(runner_parser)
+    sys.exit(main(runner_parser.parse_args()))
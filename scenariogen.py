@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: synthetic test scenario generator.
+  Writes valid test files (same format as testmowers*.data) with a configurable grid size, number of mowers, program
+  length and ratio of swings in the programs.
+"""
+
+import argparse
+import random
+
+from mower import Mower
+
+
+def generate_program(rnd, program_length, turn_ratio):
+    """
+    Generate a random program.
+    :param rnd: random.Random object
+    :param program_length: number of moving codes of the program
+    :param turn_ratio: ratio of swings ('G' or 'D') in the program
+    :return: the program as a string
+    """
+    weights = [1.0 - turn_ratio, turn_ratio / 2.0, turn_ratio / 2.0]
+    return ''.join(rnd.choices(['A', 'G', 'D'], weights=weights, k=program_length))
+
+
+def generate_scenario(file_name, up_right_corner=(5, 5), mowers_count=2, program_length=10, turn_ratio=0.3,
+                      seed=None):
+    """
+    Write a random test file.
+    :param file_name: test file to write
+    :param up_right_corner: upper right corner of the lawn grid
+    :param mowers_count: number of mowers
+    :param program_length: number of moving codes of each mower program
+    :param turn_ratio: ratio of swings ('G' or 'D') in the programs
+    :param seed: seed of the random generator (optional)
+    :return: the total number of moving codes written
+    """
+    if not Mower.is_valid_position(up_right_corner):
+        raise Exception('up_right_corner parameter should be a tuple2 with positive coordinates')
+    if not 0.0 <= turn_ratio <= 1.0:
+        raise Exception('turn_ratio parameter should be in [0, 1]')
+    rnd = random.Random(seed)
+    with open(file_name, 'w') as f:
+        f.write('{} {}\n'.format(up_right_corner[0], up_right_corner[1]))
+        for _ in range(mowers_count):
+            f.write('{} {} {}\n'.format(rnd.randint(0, up_right_corner[0]), rnd.randint(0, up_right_corner[1]),
+                                        rnd.choice(Mower.ORIENTATIONS)))
+            f.write(generate_program(rnd, program_length, turn_ratio) + '\n')
+    return mowers_count * program_length
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a random mowers test file.')
+    parser.add_argument('file_name', help='test file to write')
+    parser.add_argument('--grid', type=int, nargs=2, default=[5, 5], metavar=('X', 'Y'),
+                        help='upper right corner of the lawn grid')
+    parser.add_argument('--mowers', type=int, default=2, help='number of mowers')
+    parser.add_argument('--length', type=int, default=10, help='length of the mowers programs')
+    parser.add_argument('--turn-ratio', type=float, default=0.3, help='ratio of swings in the programs')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generator')
+    args = parser.parse_args()
+    generate_scenario(args.file_name, tuple(args.grid), args.mowers, args.length, args.turn_ratio, args.seed)
@@ -0,0 +1,101 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: concurrent simulation of mowers sharing a lawn.
+  Mowers are moved step by step in a round-robin way (one moving code by mower and by round) and a forward move into a
+  cell occupied by another mower is blocked. Occupied cells are kept in a hash (cell index ==> number of mowers) so that
+  the cost of a step does not depend on the number of mowers or on the size of the grid.
+"""
+
+from collections import deque
+
+from mower import Mower, expand_program
+
+FORWARD_DX = [0, 1, 0, -1]
+FORWARD_DY = [1, 0, -1, 0]
+
+
+class SharedLawnSimulation(object):
+    """
+    Round-robin scheduler of the mowers of a lawn (see lawn.Lawn) with collision detection.
+    """
+
+    def __init__(self, lawn):
+        """
+        Constructor.
+        :param lawn: a Lawn object (grid + mowers with their program)
+        """
+        self._lawn = lawn
+        self._collisions = 0        # forward moves blocked by another mower
+        self._blocked_moves = 0     # forward moves blocked by the grid edge
+        self._rounds = 0
+
+    @property
+    def collisions(self):
+        return self._collisions
+
+    @property
+    def blocked_moves(self):
+        return self._blocked_moves
+
+    @property
+    def rounds(self):
+        return self._rounds
+
+    @property
+    def stats(self):
+        """
+        :return: a dictionary with the collisions, blocked moves and rounds counts of the last run
+        """
+        return {'collisions': self._collisions, 'blocked_moves': self._blocked_moves, 'rounds': self._rounds}
+
+    def run(self):
+        """
+        Apply the programs of the mowers of the lawn, one step by mower and by round, until all the programs are
+        completed. Mowers sharing the same initial cell are allowed (they can leave it but no mower can enter it).
+        :return: the list of final status of the mowers as strings
+        """
+        up_right_x, up_right_y = self._lawn.up_right_corner
+        width = up_right_x + 1
+        mowers = [tmover[0] for tmover in self._lawn.mowers]
+        programs = [expand_program(tmover[1]) for tmover in self._lawn.mowers]
+        xs = [mower.position[0] for mower in mowers]
+        ys = [mower.position[1] for mower in mowers]
+        headings = [Mower.ORIENTATION_INDEXES[mower.orientation] for mower in mowers]
+        occupied = {}
+        for x, y in zip(xs, ys):
+            cell = y * width + x
+            occupied[cell] = occupied.get(cell, 0) + 1
+        self._collisions, self._blocked_moves, self._rounds = 0, 0, 0
+        active = deque(idx for idx, program in enumerate(programs) if program)
+        steps = [0] * len(mowers)
+        while active:
+            self._rounds += 1
+            for _ in range(len(active)):
+                idx = active.popleft()
+                moving_code = programs[idx][steps[idx]]
+                steps[idx] += 1
+                if moving_code == 'A':
+                    heading = headings[idx]
+                    next_x, next_y = xs[idx] + FORWARD_DX[heading], ys[idx] + FORWARD_DY[heading]
+                    if not (0 <= next_x <= up_right_x and 0 <= next_y <= up_right_y):
+                        self._blocked_moves += 1
+                    else:
+                        next_cell = next_y * width + next_x
+                        if next_cell in occupied:
+                            self._collisions += 1
+                        else:
+                            cell = ys[idx] * width + xs[idx]
+                            if occupied[cell] == 1:
+                                del occupied[cell]
+                            else:
+                                occupied[cell] -= 1
+                            occupied[next_cell] = 1
+                            xs[idx], ys[idx] = next_x, next_y
+                elif moving_code in Mower.SWING_OPERATIONS:
+                    headings[idx] = (headings[idx] + Mower.SWING_OPERATIONS[moving_code]) % 4
+                if steps[idx] < len(programs[idx]):
+                    active.append(idx)
+        for mower, x, y, heading in zip(mowers, xs, ys, headings):
+            mower.set_status((x, y), Mower.ORIENTATIONS[heading])
+        return [mower.get_str_status() for mower in mowers]
@@ -0,0 +1,365 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: long-running asyncio simulation service.
+  Scenarios (text format of the test files) are received as json lines (on stdin/stdout or on a unix socket),
+  gathered into micro-batches and applied by a worker pool. Responses give the final status of the mowers in the same
+  format as MowersTestPlayer.apply.
+  Request: {"id": 1, "scenario": "5 5\\n1 2 N\\nGAGAGAGAA\\n"} ==> response: {"id": 1, "status": ["1 3 N"]}
+  (or {"id": 1, "error": "Error line 2, ..."}). The {"command": "metrics"} request returns the service metrics.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from lawn import Lawn
+from mowerstestplayer import iter_mower_programs, read_grid_up_right_corner, read_line
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_BATCH_WINDOW = 0.005    # seconds to wait for more requests once a batch is started
+DEFAULT_MAX_PENDING = 1024      # queued requests before submitters are blocked (backpressure)
+LATENCY_SAMPLES = 10000         # number of latencies kept for the percentiles
+
+
+def apply_scenario_text(scenario):
+    """
+    Parse and apply a scenario given in the text format of the test files.
+    :param scenario: scenario as a string
+    :return: the list of final status of the mowers as strings
+    """
+    f = io.StringIO(scenario)
+    lawn = Lawn(read_grid_up_right_corner(read_line(f), 1))
+    for status, program in iter_mower_programs(f, lawn.up_right_corner):
+        lawn.add_mower(status[0], status[1], program)
+    return lawn.apply()
+
+
+def apply_batch(scenarios):
+    """
+    Apply a batch of scenarios (executed by the workers of the pool).
+    :param scenarios: list of scenarios as strings
+    :return: a list of tuples (True, final status) or (False, error message)
+    """
+    results = []
+    for scenario in scenarios:
+        try:
+            results.append((True, apply_scenario_text(scenario)))
+        except Exception as e:
+            results.append((False, str(e)))
+    return results
+
+
+class SimulationService(object):
+    """
+    Micro-batching simulation service.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, batch_window=DEFAULT_BATCH_WINDOW,
+                 max_pending=DEFAULT_MAX_PENDING, executor=None, max_batches_in_flight=None):
+        """
+        Constructor.
+        :param batch_size: greatest number of scenarios by batch
+        :param batch_window: seconds to wait for more requests once a batch is started
+        :param max_pending: number of queued requests before submitters are blocked
+        :param executor: worker pool (default: a ProcessPoolExecutor with a worker by CPU)
+        :param max_batches_in_flight: number of batches applied at the same time (required with an executor, default:
+                                      number of workers of the pool created by the service)
+        """
+        if executor is not None and max_batches_in_flight is None:
+            raise Exception('max_batches_in_flight parameter is required when an executor is given')
+        self._batch_size = batch_size
+        self._batch_window = batch_window
+        self._max_pending = max_pending
+        self._executor = executor
+        self._own_executor = executor is None
+        self._max_batches_in_flight = max_batches_in_flight
+        self._queue = None
+        self._batcher = None
+        self._in_flight = None
+        self._batch_tasks = set()
+        self._batch = []        # batch being gathered by the batcher task
+        self._getter = None     # pending get of the queue (kept between batches so that no request is lost)
+        self._stopped = False
+        self._start_time = None
+        self._requests, self._errors, self._batches = 0, 0, 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self):
+        """
+        Start the batcher task.
+        :return: None
+        """
+        workers = os.cpu_count() or 1
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._in_flight = asyncio.Semaphore(self._max_batches_in_flight or workers)
+        self._queue = asyncio.Queue(maxsize=self._max_pending)
+        self._start_time = time.perf_counter()
+        self._batcher = asyncio.ensure_future(self._run_batcher())
+
+    async def stop(self):
+        """
+        Stop the batcher task and the worker pool if it was created by the service. Pending requests (queued or in
+        the batch being gathered) are completed, requests submitted once the service is stopped fail.
+        :return: None
+        """
+        self._stopped = True
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        pending, self._batch = self._batch, []
+        if self._getter is not None:
+            if self._getter.done() and not self._getter.cancelled():
+                pending.append(self._getter.result())
+            else:
+                self._getter.cancel()
+            self._getter = None
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for start in range(0, len(pending), self._batch_size):
+            self._batch = pending[start:start + self._batch_size]
+            await self._dispatch()
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks)
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def submit(self, scenario):
+        """
+        Submit a scenario and wait for its result (blocks while max_pending requests are queued).
+        :param scenario: scenario as a string (text format of the test files)
+        :return: the list of final status of the mowers as strings (an exception is raised on parse errors)
+        """
+        if self._stopped:
+            raise Exception('simulation service is stopped')
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((scenario, future, time.perf_counter()))
+        if self._stopped:
+            # the service was stopped while this request was waiting for room in the queue
+            while not self._queue.empty():
+                queued_future = self._queue.get_nowait()[1]
+                if not queued_future.done():
+                    queued_future.set_exception(Exception('simulation service is stopped'))
+        return await future
+
+    async def _get(self, timeout):
+        """
+        :param timeout: seconds to wait for a request (None: no limit)
+        :return: the next queued request or None if none was queued before the timeout
+        """
+        if self._getter is None:
+            self._getter = asyncio.ensure_future(self._queue.get())
+        # unlike wait_for, wait does not cancel the get on timeout (the get is reused by the next call)
+        done, _ = await asyncio.wait([self._getter], timeout=timeout)
+        if not done:
+            return None
+        item, self._getter = self._getter.result(), None
+        return item
+
+    async def _dispatch(self):
+        """
+        Apply the gathered batch once fewer than max_batches_in_flight batches are applied (the batch is only taken
+        from self._batch after the wait, so that stop can still complete it if the batcher is cancelled meanwhile).
+        :return: None
+        """
+        await self._in_flight.acquire()
+        batch, self._batch = self._batch, []
+        task = asyncio.ensure_future(self._apply_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batcher(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            self._batch.append(await self._get(None))
+            deadline = loop.time() + self._batch_window
+            while len(self._batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                item = await self._get(timeout) if timeout > 0 else None
+                if item is None:
+                    break
+                self._batch.append(item)
+            await self._dispatch()
+
+    async def _apply_batch(self, batch):
+        try:
+            loop = asyncio.get_event_loop()
+            try:
+                results = await loop.run_in_executor(self._executor, apply_batch, [item[0] for item in batch])
+            except Exception as e:
+                results = [(False, 'service error: {}'.format(e))] * len(batch)
+            self._batches += 1
+            now = time.perf_counter()
+            for (scenario, future, submit_time), (ok, result) in zip(batch, results):
+                self._requests += 1
+                self._latencies.append(now - submit_time)
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    self._errors += 1
+                    future.set_exception(Exception(result))
+        finally:
+            self._in_flight.release()
+
+    @property
+    def max_pending(self):
+        return self._max_pending
+
+    @property
+    def metrics(self):
+        """
+        :return: a dictionary with the requests, errors and batches counts, the mean batch size, the throughput
+        (requests by second since start) and the latency percentiles (seconds) of the last requests
+        """
+        elapsed = time.perf_counter() - self._start_time if self._start_time is not None else 0.0
+        latencies = sorted(self._latencies)
+
+        def percentile(ratio):
+            return latencies[min(len(latencies) - 1, int(ratio * len(latencies)))] if latencies else 0.0
+        return {'requests': self._requests, 'errors': self._errors, 'batches': self._batches,
+                'mean_batch_size': self._requests / self._batches if self._batches else 0.0,
+                'throughput': self._requests / elapsed if elapsed > 0 else 0.0,
+                'latency_p50': percentile(0.5), 'latency_p95': percentile(0.95),
+                'latency_max': latencies[-1] if latencies else 0.0}
+
+    async def handle_line(self, line):
+        """
+        Handle a json line request.
+        :param line: request as a json string
+        :return: the response as a json string
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return json.dumps({'error': 'invalid json request'})
+        if not isinstance(request, dict):
+            return json.dumps({'error': 'json request should be an object'})
+        if request.get('command') == 'metrics':
+            return json.dumps({'id': request.get('id'), 'metrics': self.metrics})
+        try:
+            return json.dumps({'id': request.get('id'), 'status': await self.submit(request.get('scenario', ''))})
+        except Exception as e:
+            return json.dumps({'id': request.get('id'), 'error': str(e)})
+
+
+async def serve_lines(service, reader, write_response, max_in_flight):
+    """
+    Answer the json lines requests read from a stream. At most max_in_flight requests are answered at the same time:
+    the next line is only read when an answer is done (backpressure on the client).
+    :param service: a started SimulationService
+    :param reader: asyncio stream reader
+    :param write_response: coroutine function writing a response (json string)
+    :param max_in_flight: greatest number of requests answered at the same time
+    :return: None (when the stream is closed and all the requests are answered)
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+    pending = set()
+
+    async def answer(request_line):
+        try:
+            await write_response(await service.handle_line(request_line))
+        finally:
+            in_flight.release()
+    await in_flight.acquire()
+    line = await reader.readline()
+    while line:
+        if line.strip():
+            task = asyncio.ensure_future(answer(line.decode('utf-8')))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        else:
+            in_flight.release()
+        await in_flight.acquire()
+        line = await reader.readline()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def serve_stdio(service):
+    """
+    Serve json lines requests read on stdin (responses are written on stdout as soon as they are ready).
+    :param service: a started SimulationService
+    :return: None (when stdin is closed and all the requests are answered)
+    """
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async def write_response(response):
+        sys.stdout.write(response + '\n')
+        sys.stdout.flush()
+    await serve_lines(service, reader, write_response, service.max_pending)
+
+
+async def serve_unix(service, path):
+    """
+    Serve json lines requests on a unix socket (one connection can send many requests).
+    :param service: a started SimulationService
+    :param path: path of the unix socket
+    :return: None (serves forever)
+    """
+    async def handle_connection(reader, writer):
+        lock = asyncio.Lock()
+
+        async def write_response(response):
+            async with lock:
+                writer.write(response.encode('utf-8') + b'\n')
+                await writer.drain()
+        try:
+            await serve_lines(service, reader, write_response, service.max_pending)
+        finally:
+            writer.close()
+    server = await asyncio.start_unix_server(handle_connection, path=path)
+    async with server:
+        await server.serve_forever()
+
+
+async def main(args):
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers else None
+    service = SimulationService(args.batch_size, args.batch_window_ms / 1000.0, args.max_pending, executor,
+                                max_batches_in_flight=args.workers)
+    await service.start()
+    try:
+        if args.socket:
+            await serve_unix(service, args.socket)
+        else:
+            await serve_stdio(service)
+    finally:
+        await service.stop()
+        if executor is not None:
+            executor.shutdown()
+        sys.stderr.write(json.dumps(service.metrics) + '\n')
+
+
+def add_arguments(parser):
+    """
+    :param parser: argparse parser of the service command line
+    :return: None
+    """
+    parser.add_argument('--socket', default=None, help='unix socket path (default: stdin/stdout)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='greatest batch size')
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW * 1000.0,
+                        help='latency window of a batch in milliseconds')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='greatest number of queued requests')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+
+
+if __name__ == '__main__':
+    service_parser = argparse.ArgumentParser(description='Mowers simulation service (json lines requests).')
+    add_arguments(service_parser)
+    asyncio.run(main(service_parser.parse_args()))
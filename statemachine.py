@@ -0,0 +1,173 @@
+# -*- coding:utf-8 -*-
+
+"""
+  Xebia exercice: table-driven state machine core.
+  The status of a mower on a given grid is encoded as an integer: state = cell index * 4 + orientation index, where
+  cell index = y * (up_right_x + 1) + x and orientation index is the index in Mower.ORIENTATIONS.
+  For each moving code ('A', 'G' and 'D'), a transition table gives the next state of any state, so that a step is a
+  single array lookup. Building the tables costs a pure python loop over all the states of the grid: they only pay off
+  when the number of steps to apply is not lower than the number of states (see transition_table_for).
+"""
+
+import re
+from array import array
+from functools import lru_cache
+
+from mower import Mower
+
+# greatest number of states for which transition tables are built (3 tables of 4 bytes by state)
+MAX_STATES = 1 << 22
+
+INVALID_MOVING_CODES_PATTERN = re.compile('[^{}]+'.format(''.join(Mower.MOVING_CODES)))
+
+# swings only change the 2 lowest bits of the state: shift of the state by orientation index
+LEFT_SHIFTS = (3, -1, -1, -1)
+RIGHT_SHIFTS = (1, 1, 1, -3)
+
+
+def encode_state(up_right_corner, position, orientation):
+    """
+    Encode a mower status as a state.
+    :param up_right_corner: upper right corner of the lawn grid
+    :param position: position on the grid
+    :param orientation: orientation (among Mower.ORIENTATIONS)
+    :return: the state as an integer
+    """
+    if not (0 <= position[0] <= up_right_corner[0] and 0 <= position[1] <= up_right_corner[1]):
+        raise Exception('position {} is out of the grid'.format(position))
+    return (position[1] * (up_right_corner[0] + 1) + position[0]) * 4 + Mower.ORIENTATION_INDEXES[orientation]
+
+
+def decode_state(up_right_corner, state):
+    """
+    Decode a state.
+    :param up_right_corner: upper right corner of the lawn grid
+    :param state: state as an integer
+    :return: the mower status as a tuple (position, orientation)
+    """
+    y, x = divmod(state >> 2, up_right_corner[0] + 1)
+    return (x, y), Mower.ORIENTATIONS[state & 3]
+
+
+class TransitionTable(object):
+    """
+    Transition tables of the 'A', 'G' and 'D' moving codes for a given grid.
+    """
+
+    @classmethod
+    def fits(cls, up_right_corner):
+        """
+        Check if transition tables can be built for a grid.
+        :param up_right_corner: upper right corner of the lawn grid
+        :return: boolean (True if the number of states of the grid is not greater than MAX_STATES)
+        """
+        return (up_right_corner[0] + 1) * (up_right_corner[1] + 1) * 4 <= MAX_STATES
+
+    def __init__(self, up_right_corner):
+        """
+        Constructor. Build the transition tables.
+        :param up_right_corner: upper right corner of the lawn grid
+        """
+        if not Mower.is_valid_position(up_right_corner):
+            raise Exception('up_right_corner parameter should be a tuple2 with positive coordinates')
+        if not TransitionTable.fits(up_right_corner):
+            raise Exception('grid is too large to build transition tables')
+        self._up_right = up_right_corner
+        self._width = up_right_corner[0] + 1
+        states_count = self._width * (up_right_corner[1] + 1) * 4
+        typecode = 'I' if array('I').itemsize >= 4 else 'L'
+        self._tables = {
+            'G': array(typecode, [state + LEFT_SHIFTS[state & 3] for state in range(states_count)]),
+            'D': array(typecode, [state + RIGHT_SHIFTS[state & 3] for state in range(states_count)]),
+            'A': array(typecode, range(states_count)),
+        }
+        # forward moves: shift of the state when the move keeps the mower on the grid
+        forward = self._tables['A']
+        north, east = 4 * self._width, 4
+        for y in range(up_right_corner[1] + 1):
+            for x in range(self._width):
+                state = (y * self._width + x) * 4
+                if y < up_right_corner[1]:
+                    forward[state] += north
+                if x < up_right_corner[0]:
+                    forward[state + 1] += east
+                if y > 0:
+                    forward[state + 2] -= north
+                if x > 0:
+                    forward[state + 3] -= east
+
+    @property
+    def up_right_corner(self):
+        return self._up_right
+
+    def encode(self, position, orientation):
+        """
+        Encode a mower status as a state.
+        :param position: position on the grid
+        :param orientation: orientation (among Mower.ORIENTATIONS)
+        :return: the state as an integer
+        """
+        return encode_state(self._up_right, position, orientation)
+
+    def decode(self, state):
+        """
+        Decode a state.
+        :param state: state as an integer
+        :return: the mower status as a tuple (position, orientation)
+        """
+        return decode_state(self._up_right, state)
+
+    def step(self, state, moving_code):
+        """
+        :param state: current state
+        :param moving_code: moving code to apply ('A', 'G' or 'D')
+        :return: the next state
+        """
+        return self._tables[moving_code][state]
+
+    def run(self, state, moving_program):
+        """
+        Apply a program (invalid moving codes are ignored as in Mower.move_one_step).
+        :param state: initial state
+        :param moving_program: a string as a list of moving codes
+        :return: the final state
+        """
+        for table in map(self._tables.__getitem__, INVALID_MOVING_CODES_PATTERN.sub('', moving_program)):
+            state = table[state]
+        return state
+
+    def trace(self, state, moving_program):
+        """
+        Generator applying a program (made of valid moving codes) step by step.
+        :param state: initial state
+        :param moving_program: a string as a list of valid moving codes
+        :return: yields the state after each step
+        """
+        tables = self._tables
+        for moving_code in moving_program:
+            state = tables[moving_code][state]
+            yield state
+
+
+@lru_cache(maxsize=2)
+def get_transition_table(up_right_corner):
+    """
+    Transition tables are built once by grid (only the tables of the last grids are kept: up to 48 MB by grid).
+    :param up_right_corner: upper right corner of the lawn grid
+    :return: a TransitionTable object or None if the grid is too large
+    """
+    if TransitionTable.fits(up_right_corner):
+        return TransitionTable(up_right_corner)
+    return None
+
+
+def transition_table_for(up_right_corner, steps_count):
+    """
+    :param up_right_corner: upper right corner of the lawn grid
+    :param steps_count: number of steps which will be applied with the tables
+    :return: a TransitionTable object or None if the grid is too large or if building the tables would cost more than
+    applying the steps with Mower objects (less steps than states)
+    """
+    if steps_count < (up_right_corner[0] + 1) * (up_right_corner[1] + 1) * 4:
+        return None
+    return get_transition_table(up_right_corner)
@@ -1,5 +1,55 @@
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
+import matplotlib
+import numpy
+from PIL import Image
+from matplotlib.animation import AbstractMovieWriter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from benchmark import benchmark_startup, check_startup, find_regressions, run_benchmarks
+from binaryscenario import BinaryScenario, binary_to_text, text_to_binary
+from bulkparser import apply_bulk
+from checkpoints import CheckpointedHistory
+from composition import PrefixMaps, StateMaps
+from fleet import MowersFleet, encode_programs
+from instrumentation import PlayerStats
+from lawn import Lawn, apply_lawns
+from lawncoverage import DenseCoverage, SparseCoverage, make_coverage
+from mower import Mower, compile_program, count_moving_codes, expand_program, parse_program, program_length
 from mowerstestplayer import MowersTestPlayer
+from mowersviz import DEFAULT_DPI, MowersViz, build_frame_index, save_animation
+from resultcache import ResultCache, apply_cached
+from runner import RunSummary, find_scenario_files, run_files
+from scenariogen import generate_scenario
+from sharedlawn import SharedLawnSimulation
+from simulationservice import SimulationService
+from statemachine import get_transition_table, transition_table_for
+
+matplotlib.use('Agg')
+
+
+class FrameGrabber(AbstractMovieWriter):
+    """
+    Matplotlib movie writer keeping the grabbed frames (rgba pixel arrays) in memory.
+    """
+
+    def setup(self, fig, outfile, dpi=None):
+        super().setup(fig, outfile, dpi)
+        self.frames = []
+
+    def grab_frame(self, **savefig_kwargs):
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format='rgba', dpi=self.dpi)
+        self.frames.append(numpy.frombuffer(buffer.getvalue(), dtype=numpy.uint8))
+
+    def finish(self):
+        pass
 
 
 class MowerTestCase(unittest.TestCase):
@@ -38,6 +88,584 @@ class MowerTestCase(unittest.TestCase):
         self.assertEqual("3 2 E", results[0])
         # self.assertEqual("0 0 E", results[1])
 
+    def test_vectorized(self):
+        # vectorized engine should give the same results as the Mower class
+        for test_file in ['testmowers1.data', 'testmowers2.data', 'testmowers3.data']:
+            player = MowersTestPlayer(test_file)
+            player.open()
+            results = player.apply()
+            player.open()
+            self.assertEqual(results, player.apply(vectorized=True))
+        # random fleet with programs of different lengths
+        rnd = random.Random(1)
+        Mower.set_up_right_corner((7, 4))
+        mowers, programs = [], []
+        for _ in range(200):
+            mowers.append(Mower((rnd.randint(0, 7), rnd.randint(0, 4)), rnd.choice(Mower.ORIENTATIONS)))
+            programs.append(''.join(rnd.choice('AAAGD') for _ in range(rnd.randint(0, 40))))
+        fleet = MowersFleet.from_mowers(mowers)
+        fleet.run(programs)
+        # programs encoded by small windows of steps (finished mowers are dropped from the windows)
+        windowed_fleet = MowersFleet.from_mowers(mowers)
+        windowed_fleet.run(programs, chunk_bytes=1000)
+        for mower, program in zip(mowers, programs):
+            mower.move_multiple_steps(program)
+        self.assertEqual([m.get_str_status() for m in mowers], fleet.get_str_status())
+        self.assertEqual(fleet.get_str_status(), windowed_fleet.get_str_status())
+
+    def test_compiled_program(self):
+        self.assertEqual([(0, 4), (3, 2), (1, 0)], compile_program('AAAAGGDAAD'))
+        self.assertEqual([(0, 3)], compile_program('AAxDGA'))
+        # compiled execution should give the same results as a step by step execution
+        rnd = random.Random(2)
+        Mower.set_up_right_corner((6, 3))
+        for _ in range(300):
+            status = (rnd.randint(0, 6), rnd.randint(0, 3)), rnd.choice(Mower.ORIENTATIONS)
+            program = ''.join(rnd.choice('AAAAAGDX') for _ in range(rnd.randint(0, 60)))
+            compiled, stepped = Mower(*status), Mower(*status)
+            compiled.move_multiple_steps(program)
+            for action in program:
+                stepped.move_one_step(action)
+            self.assertEqual(stepped.status, compiled.status)
+
+    def test_stream(self):
+        for test_file in ['testmowers1.data', 'testmowers2.data', 'testmowers3.data']:
+            player = MowersTestPlayer(test_file)
+            player.open()
+            output = io.StringIO()
+            self.assertEqual(player.apply(), list(MowersTestPlayer(test_file).stream(output)))
+            self.assertEqual(player.all_status, output.getvalue().splitlines())
+        # errors are still reported with their line number
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'error.data')
+            with open(test_file, 'w') as f:
+                f.write('5 5\n1 2 N\nGAGA\n3 3 E\nAAXA\n')
+            results = MowersTestPlayer(test_file).stream()
+            self.assertEqual('0 1 S', next(results))
+            with self.assertRaisesRegex(Exception, 'Error line 5'):
+                next(results)
+
+    def test_bulk(self):
+        rnd = random.Random(3)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'bulk.data')
+            with open(test_file, 'w') as f:
+                f.write('9 7\r\n')
+                for _ in range(500):
+                    f.write('{} {} {}\r\n'.format(rnd.randint(0, 9), rnd.randint(0, 7), rnd.choice('NESW')))
+                    f.write(''.join(rnd.choice('AAGD') for _ in range(rnd.randint(1, 30))) + '\r\n')
+            player = MowersTestPlayer(test_file)
+            player.open()
+            results = player.apply()
+            self.assertEqual(results, apply_bulk(test_file, processes=0, shard_size=100))
+            self.assertEqual(results, apply_bulk(test_file, processes=2, shard_size=1000))
+            # errors are reported with the line number of the faulty line
+            with open(test_file, 'a') as f:
+                f.write('1 1 N\r\nAAGXD\r\n')
+            with self.assertRaisesRegex(Exception, 'Error line 1003:'):
+                apply_bulk(test_file, processes=2, shard_size=1000)
+
+    def test_lawns(self):
+        # scenarios opened one after the other keep their own grid
+        players = [MowersTestPlayer('testmowers{}.data'.format(i)) for i in [1, 2, 3]]
+        for player in players:
+            player.open()
+        self.assertEqual(["1 3 N", "5 1 E"], players[0].apply())
+        self.assertEqual(["0 0 E", "0 0 E"], players[1].apply())
+        self.assertEqual(["3 2 E"], players[2].apply())
+        # lawns applied side by side
+        def make_lawns():
+            lawns = []
+            for size in range(1, 30):
+                lawn = Lawn((size, size // 2))
+                lawn.add_mower((0, 0), 'N', 'A' * size + 'DA' + 'A' * size)
+                lawns.append(lawn)
+            return lawns
+        expected = [['{} {} E'.format(size, size // 2)] for size in range(1, 30)]
+        self.assertEqual(expected, apply_lawns(make_lawns()))
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(expected, apply_lawns(make_lawns(), executor))
+
+    def test_history(self):
+        player = MowersTestPlayer('testmowers1.data')
+        player.open()
+        histories, initial_status = player.apply(with_history=True)
+        self.assertEqual([((1, 2), 'N'), ((3, 3), 'E')], initial_status)
+        self.assertEqual(9, len(histories[0]))
+        self.assertEqual((((1, 2), 'W'), 'G'), histories[0][0])
+        self.assertEqual((((1, 3), 'N'), 'A'), histories[0][-1])
+        self.assertEqual(["1 3 N", "5 1 E"], ['{} {} {}'.format(h[-1][0][0][0], h[-1][0][0][1], h[-1][0][1])
+                                              for h in histories])
+        x, y, orientations, actions = histories[1].to_numpy()
+        self.assertEqual([4, 5, 5, 5, 5, 5, 4, 4, 4, 5], x.tolist())
+        self.assertEqual([0, 0, 2, 0, 0, 2, 0, 2, 2, 0], actions.tolist())
+        self.assertTrue(histories[1].nbytes < 1000)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = histories[1].save_npy(os.path.join(tmp_dir, 'mower2'))
+            self.assertEqual(y.tolist(), numpy.load(files[1]).tolist())
+
+    def test_transition_table(self):
+        table = get_transition_table((4, 6))
+        self.assertEqual(((3, 5), 'W'), table.decode(table.encode((3, 5), 'W')))
+        rnd = random.Random(4)
+        Mower.set_up_right_corner((4, 6))
+        for _ in range(200):
+            mower = Mower((rnd.randint(0, 4), rnd.randint(0, 6)), rnd.choice(Mower.ORIENTATIONS))
+            program = ''.join(rnd.choice('AAGDX') for _ in range(rnd.randint(0, 50)))
+            state = table.run(table.encode(mower.position, mower.orientation), program)
+            for action in program:
+                mower.move_one_step(action)
+            self.assertEqual(mower.status, table.decode(state))
+        with self.assertRaises(AttributeError):
+            mower.speed = 1
+        # tables are only built when there are at least as many steps as states (5 * 7 * 4)
+        self.assertIsNone(transition_table_for((4, 6), 139))
+        self.assertIs(table, transition_table_for((4, 6), 140))
+
+    def test_concurrent(self):
+        player = MowersTestPlayer('testmowers1.data')
+        player.open()
+        # mowers never meet in this scenario
+        self.assertEqual((["1 3 N", "5 1 E"], {'collisions': 0, 'blocked_moves': 0, 'rounds': 10}),
+                         player.apply_concurrent())
+        # two mowers moving towards each other in a corridor
+        lawn = Lawn((4, 0))
+        lawn.add_mower((0, 0), 'E', 'AAAA')
+        lawn.add_mower((4, 0), 'W', 'AAAA')
+        simulation = SharedLawnSimulation(lawn)
+        self.assertEqual(["2 0 E", "3 0 W"], simulation.run())
+        self.assertEqual(5, simulation.collisions)
+        self.assertEqual(0, simulation.blocked_moves)
+
+    def test_coverage(self):
+        player = MowersTestPlayer('testmowers1.data')
+        player.open()
+        coverage = make_coverage(player.lawn.up_right_corner)
+        player.apply(coverage=coverage)
+        self.assertIsInstance(coverage, DenseCoverage)
+        self.assertEqual(2, coverage.count(1, 2))  # initial cell of the first mower, visited again
+        self.assertEqual(11, coverage.visited_cells)
+        self.assertAlmostEqual(11 / 36, coverage.coverage_ratio())
+        # same coverage with the vectorized engine, a sparse coverage or the streaming mode
+        player.open()
+        vectorized_coverage = make_coverage(player.lawn.up_right_corner)
+        player.apply(vectorized=True, coverage=vectorized_coverage)
+        self.assertEqual(coverage.heatmap().tolist(), vectorized_coverage.heatmap().tolist())
+        sparse_coverage = make_coverage(player.lawn.up_right_corner, dense_limit=0)
+        self.assertIsInstance(sparse_coverage, SparseCoverage)
+        list(player.stream(coverage=sparse_coverage))
+        heatmap, origin = sparse_coverage.heatmap()
+        self.assertEqual(coverage.heatmap()[origin[1]:origin[1] + heatmap.shape[0],
+                                            origin[0]:origin[0] + heatmap.shape[1]].tolist(), heatmap.tolist())
+        self.assertEqual(coverage.visited_cells, sparse_coverage.visited_cells)
+        # very large grid
+        lawn = Lawn((10 ** 6, 10 ** 6))
+        lawn.add_mower((10, 10), 'E', 'A' * 1000 + 'GA')
+        large_coverage = make_coverage(lawn.up_right_corner)
+        lawn.mowers[0][0].move_multiple_steps(lawn.mowers[0][1], large_coverage)
+        self.assertEqual(1001, large_coverage.visited_cells)
+        self.assertEqual(1, large_coverage.count(1010, 11))
+
+    def test_render(self):
+        viz = MowersViz('testmowers1.data')
+        frames = viz.render_frames(0, viz.frames_count())
+        self.assertEqual(21, len(frames))
+        # seeking renders the same frame as a sequential playback
+        self.assertTrue(numpy.array_equal(frames[7], viz.render_frames(7, 8)[0]))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            anim_gif = os.path.join(tmp_dir, 'anim.gif')
+            timings = save_animation('testmowers1.data', anim_gif, processes=0)
+            self.assertEqual(21, timings['frames'])
+            self.assertEqual(21, Image.open(anim_gif).n_frames)
+            # frames rendered in the process pool give the same file
+            pool_gif = os.path.join(tmp_dir, 'pool.gif')
+            self.assertEqual(21, save_animation('testmowers1.data', pool_gif, processes=2)['frames'])
+            # same file from checkpointed histories (the checkpoint interval is forwarded to the workers)
+            checkpointed_gif = os.path.join(tmp_dir, 'checkpointed.gif')
+            MowersViz('testmowers1.data', checkpoint_interval=4).anim(checkpointed_gif, processes=2)
+            with open(anim_gif, 'rb') as f, open(pool_gif, 'rb') as pool_f, open(checkpointed_gif, 'rb') as ckpt_f:
+                content = f.read()
+                self.assertEqual(content, pool_f.read())
+                self.assertEqual(content, ckpt_f.read())
+            # offscreen frames are pixel-identical to the frames grabbed by a matplotlib writer
+            writer = FrameGrabber()
+            MowersViz('testmowers1.data').anim(os.path.join(tmp_dir, 'writer.gif'), writer=writer)
+            offscreen_frames = MowersViz('testmowers1.data').render_frames(0, 21, dpi=DEFAULT_DPI)
+            self.assertEqual(21, len(writer.frames))
+            for frame, grabbed_frame in zip(offscreen_frames, writer.frames):
+                grabbed_frame = grabbed_frame.reshape(frame.shape[0], frame.shape[1], 4)
+                self.assertTrue(numpy.array_equal(frame, grabbed_frame[..., :3]))
+
+    def test_frame_index(self):
+        programs = ['GAGAGAGAA', 'AADAADADDA']
+        self.assertEqual(([0, 10, 21], None), build_frame_index(programs))
+        self.assertEqual([0, 4, 8, 9, 10, 14, 18, 20], build_frame_index(programs, frame_step=4)[1].tolist())
+        self.assertEqual([0, 1, 3, 5, 7, 9, 10, 13, 16, 18, 19, 20],
+                         build_frame_index(programs, turns_only=True)[1].tolist())
+        self.assertEqual([0, 4, 7, 9, 10, 13, 16, 20], build_frame_index(programs, max_frames=8)[1].tolist())
+        # first and last steps of the mowers are kept even when the budget is smaller
+        self.assertEqual([0, 9, 10, 20], build_frame_index(programs, max_frames=2)[1].tolist())
+        # decimated frames are the same as the frames of the full animation
+        full_frames = MowersViz('testmowers1.data').render_frames(0, 21)
+        viz = MowersViz('testmowers1.data', frame_step=4)
+        self.assertEqual((1, 4), viz.get_mower_index_and_step(5))
+        for frame, global_step in zip(viz.render_frames(0, viz.frames_count()), [0, 4, 8, 9, 10, 14, 18, 20]):
+            self.assertTrue(numpy.array_equal(full_frames[global_step], frame))
+
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'generated.data')
+            self.assertEqual(600, generate_scenario(test_file, (8, 3), 20, 30, turn_ratio=0.5, seed=5))
+            player = MowersTestPlayer(test_file)
+            player.open()
+            self.assertEqual((8, 3), player.lawn.up_right_corner)
+            self.assertEqual(20, len(player.apply()))
+        sizes = [{'name': 'tiny', 'grid': [3, 3], 'mowers': 3, 'length': 10, 'turn_ratio': 0.2}]
+        results = run_benchmarks(sizes, repeat=1, with_viz=False, with_startup=False)
+        self.assertEqual(['open', 'apply', 'apply_with_history'], list(results['results'][0]['timings']))
+        baseline = json.loads(json.dumps(results))
+        self.assertEqual([], find_regressions(results, baseline))
+        baseline['results'][0]['timings']['apply'] = results['results'][0]['timings']['apply'] / 2.0
+        self.assertEqual(1, len(find_regressions(results, baseline)))
+
+    def test_instrumentation(self):
+        for kwargs in [{}, {'vectorized': True}, {'with_history': True},
+                       {'with_history': True, 'checkpoint_interval': 3}]:
+            stats = PlayerStats()
+            player = MowersTestPlayer('testmowers2.data', stats)
+            player.open()
+            player.apply(**kwargs)
+            self.assertEqual(['parse', 'history' if kwargs.get('with_history') else 'simulate'], list(stats.phases))
+            self.assertEqual(20, stats.steps)
+            self.assertEqual(9, stats.turns)
+            self.assertEqual(11, stats.blocked_moves)
+            self.assertEqual([{'steps': 10, 'turns': 5, 'blocked_moves': 5},
+                              {'steps': 10, 'turns': 4, 'blocked_moves': 6}], stats.per_mower)
+            self.assertTrue(stats.steps_per_second > 0)
+            self.assertEqual(20, json.loads(stats.to_json())['steps'])
+        # blocked moves counted by every engine (the history is built without transition tables: less steps than states)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'generated.data')
+            generate_scenario(test_file, (9, 9), 3, 50, seed=11)
+            per_mower = []
+            for kwargs in [{}, {'vectorized': True}, {'with_history': True}]:
+                player = MowersTestPlayer(test_file, PlayerStats())
+                player.open()
+                player.apply(**kwargs)
+                per_mower.append(player.stats.per_mower)
+            self.assertEqual([per_mower[0]] * 3, per_mower)
+        # uninstrumented player
+        player = MowersTestPlayer('testmowers2.data')
+        player.open()
+        player.apply()
+        self.assertIsNone(player.stats)
+
+    def test_binary_scenario(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for idx, test_file in enumerate(['testmowers1.data', 'testmowers2.data', 'testmowers3.data']):
+                player = MowersTestPlayer(test_file)
+                player.open()
+                binary_file = os.path.join(tmp_dir, 'test{}.bin'.format(idx))
+                self.assertEqual(len(player.mowers), text_to_binary(test_file, binary_file))
+                with BinaryScenario(binary_file) as scenario:
+                    self.assertEqual(player.lawn.up_right_corner, scenario.up_right_corner)
+                    self.assertEqual([tmover[0].status for tmover in player.mowers],
+                                     [scenario.status(i) for i in range(len(scenario))])
+                    self.assertEqual(player.apply(), scenario.apply(chunk_size=1))
+                    # small windows of steps (finished mowers are dropped from the windows)
+                    self.assertEqual(player.all_status, scenario.apply(chunk_bytes=7))
+                # back to the text format
+                text_file = os.path.join(tmp_dir, 'test{}.data'.format(idx))
+                binary_to_text(binary_file, text_file)
+                with open(test_file) as expected, open(text_file) as converted:
+                    self.assertEqual(expected.read().split(), converted.read().split())
+            # programs are packed at 2 bits by moving code
+            test_file = os.path.join(tmp_dir, 'generated.data')
+            generate_scenario(test_file, (50, 50), 100, 1001, seed=6)
+            text_to_binary(test_file, os.path.join(tmp_dir, 'generated.bin'))
+            self.assertEqual(32 + 100 * (251 + 32), os.path.getsize(os.path.join(tmp_dir, 'generated.bin')))
+            player = MowersTestPlayer(test_file)
+            player.open()
+            with BinaryScenario(os.path.join(tmp_dir, 'generated.bin')) as scenario:
+                self.assertEqual(player.mowers[7][1], scenario.program(7))
+                self.assertEqual(player.mowers[7][1][5:998], ''.join('AGD'[code] for code in
+                                                                      scenario.program_codes(7, 5, 998)))
+                self.assertEqual(player.apply(), scenario.apply())
+                self.assertEqual(player.all_status, scenario.apply(chunk_size=30, chunk_bytes=1000))
+
+    def test_result_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with ResultCache(max_entries=2, directory=os.path.join(tmp_dir, 'cache')) as cache:
+                player = MowersTestPlayer('testmowers1.data')
+                player.open()
+                self.assertEqual(["1 3 N", "5 1 E"], player.apply(cache=cache))
+                self.assertEqual({'hits': 0, 'disk_hits': 0, 'misses': 2, 'entries': 2}, cache.stats)
+                player.open()
+                self.assertEqual(["1 3 N", "5 1 E"], player.apply(cache=cache))
+                self.assertEqual((1, 3), player.mowers[0][0].position)
+                self.assertEqual(2, cache.stats['hits'])
+                # whole file
+                self.assertEqual(["0 0 E", "0 0 E"], apply_cached('testmowers2.data', cache))
+                self.assertEqual(2, cache.stats['entries'])  # LRU bound
+            # the on-disk store survives restarts
+            with ResultCache(directory=os.path.join(tmp_dir, 'cache')) as cache:
+                self.assertEqual(["0 0 E", "0 0 E"], apply_cached('testmowers2.data', cache))
+                self.assertEqual({'hits': 1, 'disk_hits': 1, 'misses': 0, 'entries': 1}, cache.stats)
+
+    def test_simulation_service(self):
+        with open('testmowers1.data') as f:
+            scenario1 = f.read()
+        with open('testmowers2.data') as f:
+            scenario2 = f.read()
+
+        async def run():
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                service = SimulationService(batch_size=4, batch_window=0.01, max_pending=2, executor=executor,
+                                            max_batches_in_flight=2)
+                await service.start()
+                results = await asyncio.gather(*[service.submit(scenario) for scenario in [scenario1, scenario2] * 5])
+                responses = [json.loads(await service.handle_line(line)) for line in
+                             [json.dumps({'id': 1, 'scenario': scenario1}),
+                              json.dumps({'id': 2, 'scenario': '5 5\n1 2 N\nGAX\n'}), 'not json', '[1]',
+                              json.dumps({'id': 3, 'command': 'metrics'})]]
+                await service.stop()
+                return results, responses, service.metrics
+
+        async def stop_pending():
+            # requests queued or being gathered in a batch when the service is stopped are still answered
+            service = SimulationService(batch_size=8, batch_window=10.0, max_pending=4)
+            await service.start()
+            submits = [asyncio.ensure_future(service.submit(scenario1)) for _ in range(6)]
+            await asyncio.sleep(0.05)
+            await service.stop()
+            stopped_results = await asyncio.wait_for(asyncio.gather(*submits), 5)
+            with self.assertRaises(Exception):
+                await service.submit(scenario1)
+            return stopped_results
+        results, responses, metrics = asyncio.run(run())
+        self.assertRaises(Exception, SimulationService, executor=ThreadPoolExecutor(max_workers=1))
+        self.assertEqual([["1 3 N", "5 1 E"]] * 6, asyncio.run(stop_pending()))
+        self.assertEqual([["1 3 N", "5 1 E"], ["0 0 E", "0 0 E"]] * 5, results)
+        self.assertEqual({'id': 1, 'status': ["1 3 N", "5 1 E"]}, responses[0])
+        self.assertEqual(2, responses[1]['id'])
+        self.assertTrue(responses[1]['error'].startswith('Error line 3'))
+        self.assertIn('error', responses[2])
+        self.assertIn('error', responses[3])
+        self.assertEqual(12, responses[4]['metrics']['requests'])
+        self.assertEqual(12, metrics['requests'])
+        self.assertEqual(1, metrics['errors'])
+        self.assertTrue(metrics['mean_batch_size'] > 1)
+        self.assertTrue(metrics['throughput'] > 0 and metrics['latency_max'] >= metrics['latency_p50'] > 0)
+
+    def test_checkpoints(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'generated.data')
+            generate_scenario(test_file, (8, 8), 3, 500, seed=7)
+            player = MowersTestPlayer(test_file)
+            player.open()
+            programs = [tmover[1] for tmover in player.mowers]
+            histories, initial_status = player.apply(with_history=True)
+            player.open()
+            checkpointed, checkpointed_initial_status = player.apply(with_history=True, checkpoint_interval=64)
+            self.assertEqual(initial_status, checkpointed_initial_status)
+            for history, checkpointed_history in zip(histories, checkpointed):
+                self.assertEqual(len(history), len(checkpointed_history))
+                self.assertEqual(list(history), list(checkpointed_history))
+                self.assertEqual(history[100:300], checkpointed_history[100:300])
+                self.assertEqual(history[-1], checkpointed_history[-1])
+                self.assertEqual(8, checkpointed_history.checkpoints_count)
+            self.assertEqual([history[-1][0] for history in histories], [tmover[0].status for tmover in player.mowers])
+            # random access
+            history = CheckpointedHistory((8, 8), initial_status[0], programs[0], interval=50)
+            self.assertEqual(initial_status[0], history.state_at(0))
+            self.assertEqual(histories[0][276][0], history.state_at(277))
+            # incremental re-simulation
+            self.assertEqual(50, history.edit(480, programs[1][:20]))  # from the checkpoint of step 450
+            self.assertGreaterEqual(150, history.set_program(programs[0][:370] + programs[1][:130]))
+            self.assertEqual(10, history.append(programs[2][:10]))
+            expected = CheckpointedHistory((8, 8), initial_status[0], history.program, interval=7)
+            self.assertEqual(list(expected), list(history))
+            self.assertEqual(expected.final_status, history.final_status)
+            self.assertRaises(Exception, history.edit, 1000, 'A')
+            self.assertRaises(Exception, history.append, 'AXA')
+            # grid too large for the transition tables
+            history = CheckpointedHistory((3000, 3000), ((0, 0), 'N'), 'AADAAG' * 50, interval=16)
+            self.assertEqual(((100, 100), 'N'), history.final_status)
+            self.assertEqual(((4, 6), 'E'), history.state_at(15))
+            # seeking in the visualizer
+            viz = MowersViz(test_file, checkpoint_interval=32)
+            full_viz = MowersViz(test_file)
+            for frame in [900, 17, 1499]:
+                viz.seek(frame)
+                full_viz.seek(frame)
+                self.assertTrue((viz._grid_lawn == full_viz._grid_lawn).all())
+                self.assertEqual(viz._circle.center, full_viz._circle.center)
+
+    def test_composition(self):
+        rnd = random.Random(8)
+        program = ''.join(rnd.choice('AAAGD') for _ in range(200))
+        Mower.set_up_right_corner((4, 6))
+        state_maps = StateMaps()
+        self.assertEqual(5 * 7 * 4, state_maps.states_count)
+        final_states = state_maps.program_map(program)
+        lawn = Lawn((4, 6))
+        for state in range(state_maps.states_count):
+            mower = lawn.add_mower(*state_maps.decode(state))
+            mower.move_multiple_steps(program)
+            self.assertEqual(mower.status, state_maps.decode(final_states[state]))
+        # repeated programs
+        self.assertTrue((state_maps.program_map(program * 5) == state_maps.program_map(program, times=5)).all())
+        xs, ys, headings = state_maps.final_status_grid('AADAAG', times=10 ** 9)
+        self.assertEqual((4, 6, 0), (xs[0, 0, 0], ys[0, 0, 0], headings[0, 0, 0]))
+        heatmap = state_maps.landing_heatmap('AAAAAAA')
+        self.assertEqual(state_maps.states_count, heatmap.sum())
+        self.assertEqual(7 + 5, heatmap[6, 0])  # heading N from column 0 and heading W from row 6
+        # prefix queries
+        for block_runs in [None, 4]:
+            prefix_maps = PrefixMaps(state_maps, program, block_runs=block_runs)
+            for step_number in [0, 1, 57, 133, 199, 200]:
+                expected = state_maps.program_map(program[:step_number])
+                self.assertTrue((expected == prefix_maps.prefix_map(step_number)).all())
+                self.assertEqual(state_maps.decode(expected[state_maps.encode((2, 3), 'W')]),
+                                 prefix_maps.prefix_status((2, 3), 'W', step_number))
+        self.assertRaises(Exception, prefix_maps.prefix_map, 201)
+        # partial runs of single state queries use scalar arithmetic (no mapping is built nor cached)
+        cached_bytes = state_maps.cached_bytes
+        for step_number in range(201):
+            mower = lawn.add_mower((2, 3), 'W')
+            mower.move_multiple_steps(program[:step_number])
+            self.assertEqual(mower.status, prefix_maps.prefix_status((2, 3), 'W', step_number))
+        self.assertEqual(cached_bytes, state_maps.cached_bytes)
+        self.assertRaises(Exception, state_maps.program_map, 'AXA')
+        # cache of the run mappings bounded by its memory budget (2 mappings)
+        small_cache_maps = StateMaps((4, 6), cache_memory=2 * state_maps.identity.nbytes)
+        self.assertTrue((final_states == small_cache_maps.program_map(program)).all())
+        self.assertEqual(2 * state_maps.identity.nbytes, small_cache_maps.cached_bytes)
+
+    def test_runner(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'sub'))
+            for idx in range(4):
+                generate_scenario(os.path.join(tmp_dir, 'sub' if idx % 2 else '', 'gen{}.data'.format(idx)), (9, 9),
+                                  3, 50, seed=idx)
+            with open(os.path.join(tmp_dir, 'wrong.data'), 'w') as f:
+                f.write('5 5\n1 2 X\nAA\n')
+            with open(os.path.join(tmp_dir, 'sub', 'gen1.expected'), 'w') as f:
+                f.write('0 0 N\n')
+            player = MowersTestPlayer(os.path.join(tmp_dir, 'gen0.data'))
+            player.open()
+            with open(os.path.join(tmp_dir, 'gen0.expected'), 'w') as f:
+                f.write('\n'.join(player.apply()) + '\n')
+            files = find_scenario_files([tmp_dir, 'testmowers1.data'])
+            self.assertEqual(6, len(files))
+            for workers in [0, 2]:
+                summary = RunSummary()
+                results = {}
+                for result in run_files(files, workers):
+                    summary.add(result)
+                    results[os.path.basename(result['file'])] = result
+                summary.stop()
+                self.assertEqual('PASS', results['gen0.data']['check'])
+                self.assertEqual('FAIL', results['gen1.data']['check'])
+                self.assertEqual('DONE', results['gen2.data']['check'])
+                self.assertEqual(["1 3 N", "5 1 E"], results['testmowers1.data']['status'])
+                self.assertEqual('ERROR', results['wrong.data']['check'])
+                self.assertTrue(results['wrong.data']['error'].startswith('Error line 2'))
+                self.assertFalse(summary.succeeded)
+                self.assertEqual({'PASS': 1, 'FAIL': 1, 'ERROR': 1, 'DONE': 3}, summary.checks)
+                self.assertEqual(4 * 3 * 50 + 9 + 10, summary.to_dict()['steps'])
+                self.assertIn('6 files (1 passed, 1 failed, 1 errors, 3 unchecked)', str(summary))
+
+    def test_headless_startup(self):
+        script = ('import sys\nimport mowers\nstatus = mowers.main(["run", "--quiet", "testmowers1.data"])\n'
+                  'print(status, [name for name in ("numpy", "matplotlib") if name in sys.modules])')
+        output = subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        self.assertEqual("0 []", output.split('\n')[-2])
+        # visualization pieces are loaded on first use
+        script = ('import sys\nfrom mowersviz import MowersViz\n'
+                  'print(MowersViz._full_green_cmap, "matplotlib.animation" in sys.modules)')
+        output = subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        self.assertEqual("None False", output.strip())
+        self.assertIs(MowersViz.full_green_cmap(), MowersViz.full_green_cmap())
+        timings, loaded = benchmark_startup(repeat=1, with_viz=False)
+        self.assertEqual([], loaded)
+        self.assertEqual([], check_startup({'timings': timings, 'headless_loads': loaded}, budget=10.0))
+        self.assertEqual(1, len(check_startup({'timings': timings, 'headless_loads': loaded}, budget=0.0)))
+
+    def test_repetition_groups(self):
+        self.assertEqual(['A', (['GA', (['D'], 2)], 3)], parse_program('A(GA(D)2)3'))
+        self.assertEqual('AGADDGADDGADD', expand_program('A(GA(D)2)3'))
+        self.assertEqual(13, program_length('A(GA(D)2)3'))
+        self.assertEqual({'A': 2 * 10 ** 9, 'D': 10 ** 9, 'G': 0}, count_moving_codes('(AAD)1000000000'))
+        for program in ['(AA', 'AA)3', '(AA)', 'A(X)2']:
+            self.assertRaises(Exception, parse_program, program)
+        # cycles are skipped: 1e9 iterations run in a few cycles
+        mower = Mower((0, 0), 'N', Lawn((50, 50)))
+        self.assertEqual(0, mower.move_multiple_steps('(AAD)1000000001'))
+        self.assertEqual(((0, 2), 'E'), mower.status)
+        self.assertEqual(10 ** 9 - 50, mower.move_multiple_steps('(A)1000000000'))
+        self.assertEqual(((50, 2), 'E'), mower.status)
+        # cycles are still skipped with a coverage (the visits of a cycle are multiplied)
+        coverage = DenseCoverage((50, 50))
+        self.assertEqual(0, Mower((0, 0), 'N', Lawn((50, 50))).move_multiple_steps('(AAD)1000000001', coverage))
+        self.assertEqual(2 * 1000000001, int(coverage.heatmap().sum()))
+        self.assertEqual(250000001, coverage.count(0, 1))  # one visit every 4 iterations
+        for coverage_class in [DenseCoverage, SparseCoverage]:
+            grouped_coverage, flat_coverage = coverage_class((6, 4)), coverage_class((6, 4))
+            program = 'A(GA(AAD)5A)17D'
+            Mower((1, 1), 'S', Lawn((6, 4))).move_multiple_steps(program, grouped_coverage)
+            Mower((1, 1), 'S', Lawn((6, 4))).move_multiple_steps(expand_program(program), flat_coverage)
+            self.assertEqual([flat_coverage.count(x, y) for x in range(7) for y in range(5)],
+                             [grouped_coverage.count(x, y) for x in range(7) for y in range(5)])
+        rnd = random.Random(9)
+        lawn = Lawn((6, 4))
+        for _ in range(200):
+            program = '{}({}({})7)13{}'.format(*[''.join(rnd.choice('AAAGD') for _ in range(rnd.randint(0, 5)))
+                                                 for _ in range(4)])
+            status = ((rnd.randint(0, 6), rnd.randint(0, 4)), rnd.choice(Mower.ORIENTATIONS))
+            grouped, flat = Mower(status[0], status[1], lawn), Mower(status[0], status[1], lawn)
+            self.assertEqual(flat.move_multiple_steps(expand_program(program)), grouped.move_multiple_steps(program))
+            self.assertEqual(flat.status, grouped.status)
+        # test files with repetition groups
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_file = os.path.join(tmp_dir, 'grouped.data')
+            with open(test_file, 'w') as f:
+                f.write('5 5\n1 2 N\n(GA)3(GA(A)0)1A\n3 3 E\n(AAD)2(AD)1DA\n')
+            player = MowersTestPlayer(test_file, PlayerStats())
+            player.open()
+            self.assertEqual(["1 3 N", "5 1 E"], player.apply())
+            self.assertEqual(19, player.stats.steps)
+            for kwargs in [{'vectorized': True}, {'with_history': True}, {'with_history': True,
+                                                                          'checkpoint_interval': 4}]:
+                player.open()
+                result = player.apply(**kwargs)
+                if 'with_history' in kwargs:
+                    self.assertEqual('GAGAGAGAA', ''.join(step[1] for step in result[0][0]))
+                self.assertEqual(["1 3 N", "5 1 E"], player.all_status if 'with_history' not in kwargs else
+                                 [tmover[0].get_str_status() for tmover in player.mowers])
+            self.assertEqual(["1 3 N", "5 1 E"], list(MowersTestPlayer(test_file).stream()))
+            self.assertEqual(["1 3 N", "5 1 E"], apply_bulk(test_file, processes=0))
+            state_maps = StateMaps((5, 5))
+            self.assertTrue((state_maps.program_map('(AAD)1000001') == state_maps.program_map('AAD', times=1000001))
+                            .all())
+            with open(test_file, 'w') as f:
+                f.write('5 5\n1 2 N\n(GA)3A\n3 3 E\n(AAD2\n')
+            player = MowersTestPlayer(test_file)
+            with self.assertRaises(Exception) as context:
+                player.open()
+            self.assertTrue(str(context.exception).startswith('Error line 5'))
+            # huge repetition groups: the vectorized engine applies them mower by mower, expanding engines reject them
+            with open(test_file, 'w') as f:
+                f.write('50 50\n0 0 N\n(AAD)1000000001\n3 3 E\nAAD\n')
+            player = MowersTestPlayer(test_file)
+            player.open()
+            self.assertEqual(["0 2 E", "5 3 S"], player.apply(vectorized=True))
+            player.open()
+            self.assertRaises(Exception, player.apply, with_history=True)
+            self.assertRaises(Exception, encode_programs, ['(AAD)1000000001'])
+
 
 if __name__ == '__main__':
     unittest.main()